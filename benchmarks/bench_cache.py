@@ -0,0 +1,35 @@
+# Cost of the conversion cache key (canonical_form) next to the conversion
+# it saves, on long chains such as the Thompson NFA of a long word. Exits
+# with status 1 when building a key takes more than 10 times the
+# conversion: colour refinement used to need one round per chain state.
+# Usage: python benchmarks/bench_cache.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import canonical_form, nfa_to_dfa, regex_to_nfa
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    failures = []
+    print(f"{'case':<22}{'states':>8}{'convert':>10}{'NFA key':>10}{'DFA key':>10}")
+    for length in (1000, 4000, 16000):
+        nfa = regex_to_nfa('ab' * (length // 4), 'ab')
+        dfa, convert_time = timed(nfa_to_dfa, nfa, 'bitset')
+        _, nfa_key_time = timed(canonical_form, nfa)
+        _, dfa_key_time = timed(canonical_form, dfa)
+        label = f'Thompson (ab)^{length // 4}'
+        print(f"{label:<22}{len(nfa.states):>8}{convert_time:>10.4f}{nfa_key_time:>10.4f}{dfa_key_time:>10.4f}")
+        if nfa_key_time > 10 * convert_time:
+            failures.append(f"{label}: key {nfa_key_time:.3f} s for a {convert_time:.3f} s conversion")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# Compares DFAs built from Brzozowski derivatives with the
+# Thompson -> subset construction -> Hopcroft path. Exits with status 1 when
+# the derivative DFA accepts another language than the minimal one, or when
+# the nested-star family, whose derivatives used to grow exponentially, gets
+# more than 3 * depth derivative states.
+# Usage: python benchmarks/bench_derivatives.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import DerivativeMatcher, dfa_equivalent, minimize_dfa, nfa_to_dfa, regex_to_nfa
+from generators import nested_star_regex, random_regex
+
+# (label, regex, bound on the derivative DFA or None)
+def cases():
+    yield 'worst case n=8', '(a|b)*a' + '(a|b)' * 8, None
+    yield 'worst case n=12', '(a|b)*a' + '(a|b)' * 12, None
+    yield 'long word', 'ab' * 2000, None
+    yield 'star of unions', '(' + '|'.join('ab' * i for i in range(1, 30)) + ')*', None
+    rng = random.Random(0)
+    for i in range(3):
+        yield f'random depth 10 #{i}', random_regex(rng, 10), None
+    for depth in (14, 22, 100, 600):  # 600 used to overflow the stack
+        yield f'nested stars k={depth}', nested_star_regex(depth), 3 * depth
+
+def main():
+    failures = []
+    print(f"{'case':<22}{'deriv DFA':>10}{'time':>9}{'subset DFA':>11}{'minimal':>9}{'time':>9}")
+    for label, regex, bound in cases():
+        start = time.perf_counter()
+        derived = DerivativeMatcher(regex, 'abc').to_dfa()
+        derived_time = time.perf_counter() - start
+        start = time.perf_counter()
+        subset = nfa_to_dfa(regex_to_nfa(regex, 'abc'), 'bitset')
+        minimal = minimize_dfa(subset)
+        subset_time = time.perf_counter() - start
+        print(f"{label:<22}{len(derived.states):>10}{derived_time:>9.4f}"
+              f"{len(subset.states):>11}{len(minimal.states):>9}{subset_time:>9.4f}")
+        if not dfa_equivalent(derived, minimal):
+            failures.append(f"{label}: the derivative DFA accepts another language")
+        if bound is not None and len(derived.states) > bound:
+            failures.append(f"{label}: {len(derived.states)} derivative states, expected at most {bound}")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
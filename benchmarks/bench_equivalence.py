@@ -0,0 +1,32 @@
+# Hopcroft-Karp equivalence on large DFAs: the bitset DFA of (a|b)*a(a|b)^n
+# against its minimization (equivalent), and against the DFA of the same
+# regex with one more (a|b) (different, with a shortest counterexample).
+# Usage: python benchmarks/bench_equivalence.py [n]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import dfa_equivalence, minimize_dfa, nfa_to_dfa, regex_to_nfa
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<34}{time.perf_counter() - start:8.3f} s")
+    return result
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    regex = '(a|b)*a' + '(a|b)' * n
+    dfa = timed('nfa_to_dfa', lambda: nfa_to_dfa(regex_to_nfa(regex, 'ab'), 'bitset'))
+    minimal = timed('minimize_dfa', lambda: minimize_dfa(dfa))
+    other = timed('nfa_to_dfa (n + 1)', lambda: nfa_to_dfa(regex_to_nfa(regex + '(a|b)', 'ab'), 'bitset'))
+    print(f"DFA states: {len(dfa.states)}, minimal: {len(minimal.states)}, other: {len(other.states)}")
+    equal, _ = timed('equivalence, equal', lambda: dfa_equivalence(dfa, minimal))
+    assert equal
+    equal, word = timed('equivalence, different', lambda: dfa_equivalence(dfa, other))
+    assert not equal
+    print(f"counterexample: {word!r}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# Compares CompiledDFA against walking the dict-of-dicts DFA transitions.
+# Usage: python benchmarks/bench_matcher.py [num_strings] [length]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import CompiledDFA, load_numpy, nfa_to_dfa
+from generators import random_nfa
+
+def walk(dfa, s):
+    state = dfa.initial_state
+    for symbol in s:
+        state = dfa.transitions.get(state, {}).get(symbol)
+        if state is None:
+            return False
+    return state in dfa.final_states
+
+def timed(label, func, count):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed:8.3f} s  {count / elapsed / 1e6:8.2f} M strings/s")
+    return result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    rng = random.Random(0)
+    dfa = nfa_to_dfa(random_nfa(12, density=3.0, epsilon_ratio=0.0, seed=1), 'bitset')
+    strings = [''.join(rng.choice('ab') for _ in range(length)) for _ in range(count)]
+    print(f"DFA: {len(dfa.states)} states; {count} strings of length {length}")
+    matcher = CompiledDFA(dfa)
+    expected = timed("dict-of-dicts walk", lambda: [walk(dfa, s) for s in strings], count)
+    assert timed("CompiledDFA.accepts_many", lambda: matcher.accepts_many(strings), count) == expected
+    label = "CompiledDFA.accepts_batch" + ("" if load_numpy() is not None else " (no NumPy)")
+    assert timed(label, lambda: matcher.accepts_batch(strings), count) == expected
+
+if __name__ == '__main__':
+    main()
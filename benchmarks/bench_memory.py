@@ -0,0 +1,59 @@
+# Memory of the dict-of-dicts NFA/DFA against CompactNFA/CompactDFA, measured
+# with tracemalloc while loading the same text file both ways.
+# Usage: python benchmarks/bench_memory.py [num_states]
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import (DFA, CompactDFA, format_automaton, read_automaton, read_automaton_store,
+                       read_compact_automaton)
+from generators import random_nfa
+
+def random_dfa(num_states, seed):
+    rng = random.Random(seed)
+    states = [f'D{i}' for i in range(num_states)]
+    transitions = {state: {symbol: rng.choice(states) for symbol in 'abcd'} for state in states}
+    return DFA(states, 'abcd', transitions, states[0], rng.sample(states, num_states // 3))
+
+def read_dict_dfa(filename):
+    nfa = read_automaton(filename)
+    transitions = {state: {symbol: next(iter(targets)) for symbol, targets in by_symbol.items()}
+                   for state, by_symbol in nfa.transitions.items()}
+    return DFA(nfa.states, nfa.alphabet, transitions, nfa.initial_state, nfa.final_states)
+
+def read_compact_dfa(filename):
+    return CompactDFA(read_automaton_store(filename))
+
+def retained(load, filename):
+    tracemalloc.start()
+    automaton = load(filename)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del automaton
+    return size
+
+def compare(label, automaton, load_dict, load_compact):
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write(format_automaton(automaton) + '\n')
+    try:
+        dict_size = retained(load_dict, f.name)
+        compact_size = retained(load_compact, f.name)
+    finally:
+        os.unlink(f.name)
+    edges = sum(len(targets) if isinstance(targets, set) else 1
+                for by_symbol in automaton.transitions.values() for targets in by_symbol.values())
+    print(f"{label}: {len(automaton.states)} states, {edges} transitions")
+    print(f"  dict of dicts {dict_size / 1e6:8.2f} MB  {dict_size / edges:7.1f} B/transition")
+    print(f"  compact       {compact_size / 1e6:8.2f} MB  {compact_size / edges:7.1f} B/transition"
+          f"  ({dict_size / compact_size:.1f}x smaller)")
+
+def main():
+    num_states = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    compare('NFA', random_nfa(num_states, epsilon_ratio=0.2, seed=1), read_automaton, read_compact_automaton)
+    compare('DFA', random_dfa(num_states, 2), read_dict_dfa, read_compact_dfa)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# Scaling of the parallel subset construction from 1 to N worker processes.
+# Usage: python benchmarks/bench_parallel.py [n] [max_workers]
+# The NFA is (a|b)*a(a|b)^n, whose DFA has 2^(n+1) states.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import nfa_to_dfa, nfa_to_dfa_parallel, regex_to_nfa
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 13
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    nfa = regex_to_nfa('(a|b)*a' + '(a|b)' * n, 'ab')
+    start = time.perf_counter()
+    reference = nfa_to_dfa(nfa, 'bitset')
+    sequential = time.perf_counter() - start
+    print(f"NFA: {len(nfa.states)} states, DFA: {len(reference.states)} states, {os.cpu_count()} CPUs")
+    print(f"{'bitset (sequential)':<22}{sequential:8.3f} s")
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        dfa = nfa_to_dfa_parallel(nfa, workers)
+        elapsed = time.perf_counter() - start
+        assert dfa.transitions == reference.transitions
+        print(f"{f'parallel, {workers} workers':<22}{elapsed:8.3f} s  speedup {sequential / elapsed:5.2f}x")
+        workers *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# Compares Thompson and Glushkov constructions end to end (RE -> NFA -> DFA).
+# Usage: python benchmarks/bench_regex_constructions.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import nfa_to_dfa, regex_to_nfa
+from generators import random_regex
+
+def cases():
+    yield 'worst case n=10', '(a|b)*a' + '(a|b)' * 10
+    yield 'worst case n=14', '(a|b)*a' + '(a|b)' * 14
+    yield 'star of unions', '(' + '|'.join('ab' * i for i in range(1, 30)) + ')*'
+    rng = random.Random(0)
+    for i in range(3):
+        yield f'random depth 9 #{i}', random_regex(rng, 9)
+
+def main():
+    print(f"{'case':<22}{'strategy':<10}{'NFA':>8}{'eps':>8}{'DFA':>8}{'RE->NFA':>10}{'NFA->DFA':>10}")
+    for label, regex in cases():
+        for strategy in ('thompson', 'glushkov'):
+            start = time.perf_counter()
+            nfa = regex_to_nfa(regex, ['a', 'b'], strategy)
+            built = time.perf_counter()
+            dfa = nfa_to_dfa(nfa, 'bitset')
+            done = time.perf_counter()
+            epsilon = sum(len(by_symbol.get('', ())) for by_symbol in nfa.transitions.values())
+            print(f"{label:<22}{strategy:<10}{len(nfa.states):>8}{epsilon:>8}{len(dfa.states):>8}"
+                  f"{built - start:>10.4f}{done - built:>10.4f}")
+
+if __name__ == '__main__':
+    main()
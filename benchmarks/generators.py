@@ -0,0 +1,63 @@
+# Seeded generators of synthetic automata and regular expressions for the
+# benchmarks. The same arguments always give the same output.
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import NFA
+
+# num_states states, about density transitions per state on non-epsilon
+# symbols and epsilon_ratio epsilon moves per state.
+def random_nfa(num_states, density=2.0, epsilon_ratio=0.1, alphabet='ab', seed=0):
+    rng = random.Random(seed)
+    states = [f'q{i}' for i in range(num_states)]
+    transitions = {}
+    for _ in range(int(num_states * density)):
+        state = rng.choice(states)
+        symbol = rng.choice(alphabet)
+        transitions.setdefault(state, {}).setdefault(symbol, set()).add(rng.choice(states))
+    for _ in range(int(num_states * epsilon_ratio)):
+        state = rng.choice(states)
+        transitions.setdefault(state, {}).setdefault('', set()).add(rng.choice(states))
+    final_states = rng.sample(states, max(1, num_states // 4))
+    return NFA(states, alphabet, transitions, states[0], final_states)
+
+# Random expression over a and b with nesting depth at most depth.
+def random_regex(rng, depth):
+    roll = rng.random()
+    if depth == 0 or roll < 0.2:
+        return rng.choice('ab')
+    if roll < 0.55:
+        return random_regex(rng, depth - 1) + random_regex(rng, depth - 1)
+    if roll < 0.8:
+        return f"({random_regex(rng, depth - 1)}|{random_regex(rng, depth - 1)})"
+    return f"({random_regex(rng, depth - 1)})*"
+
+# (a|b)*a(a|b)^n: n + 2 NFA states but 2^(n+1) DFA states, all distinguishable.
+def worst_case_regex(n):
+    return '(a|b)*a' + '(a|b)' * n
+
+# ((...((a|c)b)*|c)b)*...: the minimal DFA has 2 * depth states, but
+# derivatives that are only compared up to similarity grow exponentially.
+def nested_star_regex(depth):
+    regex = 'a'
+    for _ in range(depth):
+        regex = f"(({regex}|c)b)*"
+    return regex
+
+def nested_regex(depth, alphabet='ab', seed=0):
+    rng = random.Random(seed)
+
+    def build(level):
+        if level == 0:
+            return rng.choice(alphabet)
+        inner = build(level - 1)
+        roll = rng.random()
+        if roll < 0.4:
+            return f"({inner}|{rng.choice(alphabet)})*"
+        if roll < 0.7:
+            return f"({inner}|{build(level // 2)})"
+        return f"{rng.choice(alphabet)}({inner})*"
+
+    return build(depth)
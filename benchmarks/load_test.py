@@ -0,0 +1,133 @@
+# Load test for the conversion server: concurrent clients send a mix of
+# nfa2dfa, minimize and re2dfa requests (some repeated, so the warm cache
+# is exercised) and the script reports p50/p99 latency and throughput.
+# Usage: python benchmarks/load_test.py [--spawn] [--socket PATH | --port N]
+#        [--requests N] [--concurrency N] [--repeat-ratio R]
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import format_automaton
+from generators import nested_regex, random_nfa, worst_case_regex
+
+def make_requests(count, repeat_ratio, seed):
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        if requests and rng.random() < repeat_ratio:
+            requests.append(dict(rng.choice(requests)))
+            continue
+        roll = rng.random()
+        if roll < 0.4:
+            nfa = random_nfa(rng.randint(10, 60), 1.5, 0.1, seed=rng.randrange(10 ** 9))
+            requests.append({'command': 'nfa2dfa', 'input': format_automaton(nfa),
+                             'options': {'engine': 'bitset'}})
+        elif roll < 0.7:
+            nfa = random_nfa(rng.randint(10, 40), 1.5, 0.1, seed=rng.randrange(10 ** 9))
+            requests.append({'command': 'minimize', 'input': format_automaton(nfa),
+                             'options': {'engine': 'bitset'}})
+        elif roll < 0.85:
+            requests.append({'command': 're2dfa', 'regex': worst_case_regex(rng.randint(2, 9)),
+                             'alphabet': ['a', 'b']})
+        else:
+            requests.append({'command': 're2dfa', 'regex': nested_regex(rng.randint(4, 12),
+                                                                        seed=rng.randrange(10 ** 9)),
+                             'alphabet': ['a', 'b']})
+    for i, request in enumerate(requests):
+        request['id'] = i
+    return requests
+
+async def connect(args):
+    if args.socket:
+        return await asyncio.open_unix_connection(args.socket, limit=2 ** 26)
+    return await asyncio.open_connection(args.host, args.port, limit=2 ** 26)
+
+async def client(args, queue, latencies, outcomes):
+    reader, writer = await connect(args)
+    try:
+        while queue:
+            request = queue.pop()
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if response.get('ok'):
+                outcomes['cached' if response.get('cached') else 'ok'] += 1
+            else:
+                outcomes[response.get('error', 'error').split(':')[0]] += 1
+    finally:
+        writer.close()
+
+async def wait_for_server(args, seconds=30):
+    deadline = time.perf_counter() + seconds
+    while True:
+        try:
+            reader, writer = await connect(args)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+async def run(args):
+    requests = make_requests(args.requests, args.repeat_ratio, args.seed)
+    await wait_for_server(args)
+    queue = list(reversed(requests))
+    latencies = []
+    outcomes = Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args, queue, latencies, outcomes) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{len(latencies)} requests, {args.concurrency} clients, {elapsed:.2f} s, "
+          f"{len(latencies) / elapsed:.1f} req/s")
+    print(f"latency p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms")
+    print("outcomes: " + ', '.join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test for conversor.py serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket')
+    parser.add_argument('--spawn', action='store_true', help='start a server for the test')
+    parser.add_argument('--workers', type=int, help='server workers when spawning')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--repeat-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    server = None
+    if args.spawn:
+        if args.socket is None and hasattr(asyncio, 'open_unix_connection'):
+            args.socket = os.path.join(tempfile.mkdtemp(), 'conversor.sock')
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                'conversor.py'), 'serve']
+        command += ['--socket', args.socket] if args.socket else ['--port', str(args.port)]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command)
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Benchmark suite: times read_automaton, regex_to_nfa, nfa_to_dfa, dfa_to_re
+# and print_automaton on seeded synthetic inputs and writes time, peak memory
+# and output sizes to JSON, so runs on different commits can be compared.
+# Usage: python benchmarks/suite.py [-o results.json] [--repeat N] [--quick]
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversor import (RegexLimitError, dfa_to_re, format_automaton, minimize_dfa, nfa_to_dfa,
+                       print_automaton, read_automaton, regex_to_nfa)
+from generators import nested_regex, random_nfa, worst_case_regex
+
+def automaton_size(automaton):
+    transitions = 0
+    for by_symbol in automaton.transitions.values():
+        for targets in by_symbol.values():
+            transitions += 1 if isinstance(targets, str) else len(targets)
+    return {'states': len(automaton.states), 'transitions': transitions}
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {'time': min(times), 'mean_time': sum(times) / len(times), 'peak_memory': peak}
+
+def run_case(name, nfa, regex, repeat, limits):
+    results = []
+
+    def record(operation, func, size):
+        try:
+            output, entry = measure(func, repeat)
+        except RegexLimitError as error:
+            results.append({'case': name, 'operation': operation, 'error': str(error)})
+            return None
+        entry.update(case=name, operation=operation, **size(output))
+        results.append(entry)
+        return output
+
+    if regex is not None:
+        nfa = record('regex_to_nfa', lambda: regex_to_nfa(regex, 'ab'), automaton_size)
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write(format_automaton(nfa) + '\n')
+    try:
+        record('read_automaton', lambda: read_automaton(f.name), automaton_size)
+    finally:
+        os.unlink(f.name)
+    for engine in ('sets', 'bitset'):
+        dfa = record(f'nfa_to_dfa[{engine}]', lambda: nfa_to_dfa(nfa, engine), automaton_size)
+    minimal = minimize_dfa(dfa)
+    record('dfa_to_re', lambda: dfa_to_re(minimal, **limits),
+           lambda regex: {'regex_length': len(regex)})
+
+    def print_quietly():
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            print_automaton(dfa)
+        return output.getvalue()
+
+    record('print_automaton', print_quietly, lambda text: {'output_bytes': len(text.encode())})
+    return results
+
+# Random NFAs are kept below the density where the subset construction
+# blows up; the worst-case regexes cover that separately.
+RANDOM_CASES = ((100, 1.5, 0.05), (1000, 1.2, 0.1), (1000, 1.5, 0.0), (10000, 1.2, 0.0))
+
+def cases(quick):
+    for num_states, density, epsilon_ratio in RANDOM_CASES[:2] if quick else RANDOM_CASES:
+        name = f'random n={num_states} d={density} e={epsilon_ratio}'
+        yield name, random_nfa(num_states, density, epsilon_ratio, seed=num_states), None
+    for n in ((4, 8) if quick else (4, 8, 12)):
+        yield f'worst case n={n}', None, worst_case_regex(n)
+    for depth in ((5, 10) if quick else (5, 10, 20)):
+        yield f'nested depth={depth}', None, nested_regex(depth, seed=depth)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite')
+    parser.add_argument('-o', '--output', default='benchmark_results.json')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-size', type=int, default=10 ** 6,
+                        help='regex size limit for each dfa_to_re call')
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help='time limit for each dfa_to_re call')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs only')
+    args = parser.parse_args()
+    limits = {'max_size': args.max_size, 'max_seconds': args.max_seconds}
+    results = []
+    for name, nfa, regex in cases(args.quick):
+        for entry in run_case(name, nfa, regex, args.repeat, limits):
+            results.append(entry)
+            if 'error' in entry:
+                print(f"{name:<32}{entry['operation']:<22}{entry['error']}")
+            else:
+                print(f"{name:<32}{entry['operation']:<22}{entry['time']:10.4f} s"
+                      f"{entry['peak_memory'] / 1e6:10.2f} MB")
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'limits': limits,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
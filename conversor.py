@@ -1,6 +1,114 @@
+import argparse
+import cProfile
+import contextlib
+import functools
+import glob
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import struct
 import sys
 import re
-from collections import defaultdict, deque
+import signal
+import time
+import heapq
+import weakref
+from array import array
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+# NumPy is optional and only CompiledDFA.accepts_batch uses it, so it is
+# imported on first use: None until then, False when it is missing.
+_numpy = None
+
+def load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+# Opt-in instrumentation. The conversion functions report phase times and
+# counters to the Metrics object installed with instrument(); with none
+# installed every hook is one global lookup and a None test. Phase times are
+# wall clock and nest (subset_construction includes epsilon_closure).
+_metrics = None
+
+class Metrics:
+    def __init__(self, callback=None):
+        self.phases = {}  # name -> [calls, seconds]
+        self.counters = defaultdict(int)
+        self.peaks = {}
+        self.callback = callback  # called as callback(phase, seconds)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def peak(self, name, value):
+        if value > self.peaks.get(name, 0):
+            self.peaks[name] = value
+
+    def add_phase(self, name, seconds):
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def as_dict(self):
+        return {'phases': {name: {'calls': calls, 'seconds': seconds}
+                           for name, (calls, seconds) in self.phases.items()},
+                'counters': dict(self.counters), 'peaks': dict(self.peaks)}
+
+    def report(self):
+        return format_metrics(self.as_dict())
+
+def format_metrics(data):
+    lines = [f"  {name:<22}{phase['seconds']:10.4f} s {phase['calls']:>6}x"
+             for name, phase in data['phases'].items()]
+    lines.extend(f"  {name:<22}{value:>10}" for name, value in sorted(data['counters'].items()))
+    lines.extend(f"  peak {name:<17}{value:>10}" for name, value in sorted(data['peaks'].items()))
+    return '\n'.join(lines)
+
+class instrument:
+    def __init__(self, metrics=None):
+        self.metrics = Metrics() if metrics is None else metrics
+        self._previous = None
+
+    def __enter__(self):
+        global _metrics
+        self._previous = _metrics
+        _metrics = self.metrics
+        return self.metrics
+
+    def __exit__(self, *exc_info):
+        global _metrics
+        _metrics = self._previous
+
+def timed_phase(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _metrics
+            if metrics is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add_phase(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
 
 class NFA:
     def __init__(self, states, alphabet, transitions, initial_state, final_states):
@@ -10,6 +118,36 @@ class NFA:
         self.initial_state = initial_state
         self.final_states = set(final_states)
 
+    # The epsilon-closure table is cached until the transitions change. Edit
+    # them through add_transition/remove_transition (or assign a new dict);
+    # after mutating the dicts in place call invalidate_closures().
+    @property
+    def transitions(self):
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, transitions):
+        self._transitions = transitions
+        self._closures = None
+
+    def add_transition(self, from_state, to_state, symbol):
+        self._transitions.setdefault(from_state, {}).setdefault(symbol, set()).add(to_state)
+        if symbol == '':
+            self._closures = None
+
+    def remove_transition(self, from_state, to_state, symbol):
+        self._transitions.get(from_state, {}).get(symbol, set()).discard(to_state)
+        if symbol == '':
+            self._closures = None
+
+    def invalidate_closures(self):
+        self._closures = None
+
+    def epsilon_closures(self):
+        if self._closures is None:
+            self._closures = compute_epsilon_closures(self)
+        return self._closures
+
 class DFA:
     def __init__(self, states, alphabet, transitions, initial_state, final_states):
         self.states = set(states)
@@ -18,54 +156,601 @@ class DFA:
         self.initial_state = initial_state
         self.final_states = set(final_states)
 
-def read_automaton(filename):
-    with open(filename, 'r') as f:
-        lines = f.readlines()
+class AutomatonParseError(ValueError):
+    def __init__(self, filename, errors, total_errors=None):
+        self.filename = filename
+        self.errors = errors  # list of (line number, message)
+        self.total_errors = len(errors) if total_errors is None else total_errors
+        lines = [f"{filename}:{lineno}: {message}" for lineno, message in errors]
+        if self.total_errors > len(errors):
+            lines.append(f"... {self.total_errors - len(errors)} more errors")
+        super().__init__('\n'.join(lines))
 
-    alphabet = []
-    states = []
-    initial_state = None
-    final_states = []
-    transitions = defaultdict(lambda: defaultdict(set))
-    reading_transitions = False
+# Compact transition store filled by the streaming parser: state and symbol
+# names are interned to integer ids and each transition is one entry in three
+# parallel array('I') columns (source, target, symbol).
+class TransitionStore:
+    def __init__(self):
+        self.state_ids = {}
+        self.state_names = []
+        self.symbol_ids = {}
+        self.symbol_names = []
+        self.sources = array('I')
+        self.targets = array('I')
+        self.symbols = array('I')
+        self.alphabet = []
+        self.states = []
+        self.initial_state = None
+        self.final_states = []
 
-    for line in lines:
+    def state(self, name):
+        state_id = self.state_ids.get(name)
+        if state_id is None:
+            state_id = self.state_ids[name] = len(self.state_names)
+            self.state_names.append(name)
+        return state_id
+
+    def symbol(self, name):
+        symbol_id = self.symbol_ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[name] = len(self.symbol_names)
+            self.symbol_names.append(name)
+        return symbol_id
+
+    def add(self, from_state, to_state, symbol):
+        self.sources.append(self.state(from_state))
+        self.targets.append(self.state(to_state))
+        self.symbols.append(self.symbol(symbol))
+
+    def __len__(self):
+        return len(self.sources)
+
+    def to_nfa(self):
+        names = self.state_names
+        symbol_names = self.symbol_names
+        rows = [None] * len(names)
+        for source, target, symbol in zip(self.sources, self.targets, self.symbols):
+            by_symbol = rows[source]
+            if by_symbol is None:
+                by_symbol = rows[source] = {}
+            targets = by_symbol.get(symbol)
+            if targets is None:
+                by_symbol[symbol] = {names[target]}
+            else:
+                targets.add(names[target])
+        transitions = {}
+        for source, by_symbol in enumerate(rows):
+            if by_symbol is not None:
+                transitions[names[source]] = {symbol_names[symbol]: targets
+                                              for symbol, targets in by_symbol.items()}
+        return NFA(self.states, self.alphabet, transitions, self.initial_state, self.final_states)
+
+# Streaming parser: consumes any iterable of lines (an open file is read one
+# line at a time) and collects every malformed line, raising them together.
+def parse_automaton(lines, filename='<input>', max_errors=100):
+    store = TransitionStore()
+    errors = []
+    total_errors = 0
+    numbered = enumerate(lines, 1)
+    for lineno, line in numbered:
         line = line.strip()
         if not line or line.startswith('#'):
             continue
         if line == 'transicoes':
-            reading_transitions = True
+            break
+        if line.startswith('alfabeto:'):
+            store.alphabet = [store.symbol_names[store.symbol(sym.strip())]
+                              for sym in line[len('alfabeto:'):].split(',')]
+        elif line.startswith('estados:'):
+            store.states = [store.state_names[store.state(s.strip())]
+                            for s in line[len('estados:'):].split(',')]
+        elif line.startswith('inicial:'):
+            store.initial_state = line[len('inicial:'):].strip()
+        elif line.startswith('finais:'):
+            store.final_states = [s.strip() for s in line[len('finais:'):].split(',')]
+    # Hot loop over the transition lines, with the interning inlined
+    state_ids = store.state_ids
+    symbol_ids = store.symbol_ids
+    add_source = store.sources.append
+    add_target = store.targets.append
+    add_symbol = store.symbols.append
+    for lineno, line in numbered:
+        parts = line.split(',')
+        if len(parts) != 3:
+            line = line.strip()
+            if not line or line.startswith('#') or line == 'transicoes':
+                continue
+            total_errors += 1
+            if len(errors) < max_errors:
+                errors.append((lineno, f"Invalid transition line: {line}"))
             continue
-        if not reading_transitions:
-            if line.startswith('alfabeto:'):
-                alphabet = line[len('alfabeto:'):].split(',')
-                alphabet = [sym.strip() for sym in alphabet]
-            elif line.startswith('estados:'):
-                states = line[len('estados:'):].split(',')
-                states = [s.strip() for s in states]
-            elif line.startswith('inicial:'):
-                initial_state = line[len('inicial:'):].strip()
-            elif line.startswith('finais:'):
-                final_states = line[len('finais:'):].split(',')
-                final_states = [s.strip() for s in final_states]
-        else:
-            # Read transitions
-            parts = line.split(',')
-            if len(parts) != 3:
-                print(f"Invalid transition line: {line}")
-                sys.exit(1)
-            from_state = parts[0].strip()
-            to_state = parts[1].strip()
-            symbol = parts[2].strip()
-            transitions[from_state][symbol].add(to_state)
-
-    nfa = NFA(states, alphabet, transitions, initial_state, final_states)
-    return nfa
+        from_state, to_state, symbol = parts
+        from_state = from_state.strip()
+        to_state = to_state.strip()
+        symbol = symbol.strip()
+        if from_state.startswith('#'):
+            continue
+        source = state_ids.get(from_state)
+        if source is None:
+            source = store.state(from_state)
+        target = state_ids.get(to_state)
+        if target is None:
+            target = store.state(to_state)
+        symbol_id = symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = store.symbol(symbol)
+        add_source(source)
+        add_target(target)
+        add_symbol(symbol_id)
+    if total_errors:
+        raise AutomatonParseError(filename, errors, total_errors)
+    if _metrics is not None:
+        _metrics.count('parsed_transitions', len(store))
+    return store
+
+def read_automaton_store(filename):
+    with open(filename, 'r') as f:
+        return parse_automaton(f, filename)
+
+@timed_phase('parse')
+def read_automaton(filename):
+    if is_binary_automaton(filename):
+        with load_binary(filename) as mapped:
+            return mapped.to_automaton(KIND_NFA)
+    return read_automaton_store(filename).to_nfa()
+
+# Binary format (little-endian, version 1). A fixed header is followed by
+# 4-byte aligned sections:
+#   state_offsets[num_states + 1], symbol_offsets[num_symbols + 1]  (u32)
+#   strings: UTF-8 state names then symbol names, padded to 4 bytes
+#   declared[num_declared]   ids listed in "estados:"
+#   alphabet[num_alphabet]   ids listed in "alfabeto:"
+#   finals[num_finals]
+#   row_offsets[num_states + 1], edge_symbols[num_transitions],
+#   edge_targets[num_transitions]   CSR transitions, rows sorted by symbol
+BINARY_MAGIC = b'AUTB'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHIIIIIIII')
+KIND_NFA = 0
+KIND_DFA = 1
+NO_STATE = 0xFFFFFFFF
+
+def is_binary_automaton(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+def automaton_to_store(automaton):
+    store = TransitionStore()
+    store.alphabet = list(automaton.alphabet)
+    store.states = list(automaton.states)
+    store.initial_state = automaton.initial_state
+    store.final_states = list(automaton.final_states)
+    for state in sorted(automaton.states):
+        store.state(state)
+    for symbol in sorted(automaton.alphabet):
+        store.symbol(symbol)
+    for state, by_symbol in automaton.transitions.items():
+        for symbol, targets in by_symbol.items():
+            if isinstance(targets, str):
+                targets = (targets,)
+            for target in targets:
+                store.add(state, target, symbol)
+    return store
+
+# Text files do not say whether they hold a DFA; without epsilon moves and
+# with at most one target per (state, symbol) the automaton is stored as one.
+def store_is_deterministic(store):
+    epsilon = store.symbol_ids.get('')
+    seen = set()
+    for source, symbol in zip(store.sources, store.symbols):
+        if symbol == epsilon or (source, symbol) in seen:
+            return False
+        seen.add((source, symbol))
+    return True
+
+# CSR by counting sort on the source column, each row sorted by symbol
+def store_to_csr(store):
+    num_states = len(store.state_names)
+    counts = array('I', [0]) * (num_states + 1)
+    for source in store.sources:
+        counts[source + 1] += 1
+    for i in range(num_states):
+        counts[i + 1] += counts[i]
+    row_offsets = array('I', counts)
+    edge_symbols = array('I', [0]) * len(store)
+    edge_targets = array('I', [0]) * len(store)
+    fill = array('I', counts)
+    keys = [symbol * num_states + target for symbol, target in zip(store.symbols, store.targets)]
+    sources = store.sources
+    for i in sorted(range(len(store)), key=keys.__getitem__):
+        source = sources[i]
+        position = fill[source]
+        fill[source] = position + 1
+        edge_symbols[position] = store.symbols[i]
+        edge_targets[position] = store.targets[i]
+    return row_offsets, edge_symbols, edge_targets
+
+def write_store_binary(store, filename, kind=None):
+    if kind is None:
+        kind = KIND_DFA if store_is_deterministic(store) else KIND_NFA
+    declared = array('I', (store.state(name) for name in store.states))
+    alphabet = array('I', (store.symbol(name) for name in store.alphabet))
+    finals = array('I', (store.state(name) for name in store.final_states))
+    initial = NO_STATE if store.initial_state is None else store.state(store.initial_state)
+    num_states = len(store.state_names)
+    num_symbols = len(store.symbol_names)
+    row_offsets, edge_symbols, edge_targets = store_to_csr(store)
+
+    strings = bytearray()
+    state_offsets = array('I', [0])
+    for name in store.state_names:
+        strings += name.encode('utf-8')
+        state_offsets.append(len(strings))
+    symbol_offsets = array('I', [len(strings)])
+    for name in store.symbol_names:
+        strings += name.encode('utf-8')
+        symbol_offsets.append(len(strings))
+    strings_size = len(strings)
+    strings += bytes(-len(strings) % 4)
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, kind, num_states, len(declared),
+                                num_symbols, len(alphabet), len(store), len(finals), initial,
+                                strings_size)
+    sections = [state_offsets, symbol_offsets, declared, alphabet, finals,
+                row_offsets, edge_symbols, edge_targets]
+    if sys.byteorder != 'little':
+        for section in sections:
+            section.byteswap()
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.write(state_offsets)
+        f.write(symbol_offsets)
+        f.write(strings)
+        for section in sections[2:]:
+            f.write(section)
+
+def write_binary(automaton, filename):
+    kind = KIND_DFA if isinstance(automaton, (DFA, CompactDFA)) else KIND_NFA
+    write_store_binary(automaton_to_store(automaton), filename, kind)
+
+# Memory-mapped view of a binary automaton: the sections are u32 memoryviews
+# over the mapping (copied only on big-endian hosts) and names are decoded
+# on demand. The header counts must account for the whole file, so a
+# truncated or padded file is rejected when opened. successors() returns
+# copies, since the mapping cannot be closed while a view into it is alive.
+class MappedAutomaton:
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mmap) < BINARY_HEADER.size:
+                raise ValueError(f"{filename}: truncated binary automaton")
+            (magic, version, self.kind, self.num_states, num_declared, self.num_symbols,
+             num_alphabet, self.num_transitions, num_finals, initial,
+             strings_size) = BINARY_HEADER.unpack_from(self._mmap)
+            if magic != BINARY_MAGIC:
+                raise ValueError(f"{filename}: not a binary automaton")
+            if version != BINARY_VERSION:
+                raise ValueError(f"{filename}: unsupported binary format version {version}")
+            words = (2 * self.num_states + self.num_symbols + 3 + num_declared + num_alphabet
+                     + num_finals + 2 * self.num_transitions)
+            expected = BINARY_HEADER.size + 4 * words + strings_size + (-strings_size % 4)
+            if len(self._mmap) != expected:
+                raise ValueError(f"{filename}: binary automaton has {len(self._mmap)} bytes, "
+                                 f"the header describes {expected}")
+        except BaseException:
+            self._mmap.close()
+            raise
+        self._view = memoryview(self._mmap)
+        self.initial = None if initial == NO_STATE else initial
+        self._position = BINARY_HEADER.size
+        self.state_offsets = self._section(self.num_states + 1)
+        self.symbol_offsets = self._section(self.num_symbols + 1)
+        self.strings = self._view[self._position:self._position + strings_size]
+        self._position += strings_size + (-strings_size % 4)
+        self.declared = self._section(num_declared)
+        self.alphabet = self._section(num_alphabet)
+        self.finals = self._section(num_finals)
+        self.row_offsets = self._section(self.num_states + 1)
+        self.edge_symbols = self._section(self.num_transitions)
+        self.edge_targets = self._section(self.num_transitions)
+        self._state_ids = None
+
+    def _section(self, count):
+        start = self._position
+        self._position += 4 * count
+        section = self._view[start:self._position].cast('I')
+        if sys.byteorder != 'little':
+            section = array('I', section)
+            section.byteswap()
+        return section
+
+    def state_name(self, state_id):
+        return str(self.strings[self.state_offsets[state_id]:self.state_offsets[state_id + 1]], 'utf-8')
+
+    def symbol_name(self, symbol_id):
+        return str(self.strings[self.symbol_offsets[symbol_id]:self.symbol_offsets[symbol_id + 1]], 'utf-8')
+
+    def state_id(self, name):
+        if self._state_ids is None:
+            self._state_ids = {self.state_name(i): i for i in range(self.num_states)}
+        return self._state_ids[name]
+
+    def successors(self, state_id):
+        start, end = self.row_offsets[state_id], self.row_offsets[state_id + 1]
+        return self.edge_symbols[start:end].tolist(), self.edge_targets[start:end].tolist()
+
+    def to_automaton(self, kind=None):
+        if kind is None:
+            kind = self.kind
+        names = [self.state_name(i) for i in range(self.num_states)]
+        symbols = [self.symbol_name(i) for i in range(self.num_symbols)]
+        transitions = {}
+        for state_id, name in enumerate(names):
+            start, end = self.row_offsets[state_id], self.row_offsets[state_id + 1]
+            if start == end:
+                continue
+            by_symbol = transitions[name] = {}
+            for i in range(start, end):
+                symbol = symbols[self.edge_symbols[i]]
+                if kind == KIND_DFA:
+                    by_symbol[symbol] = names[self.edge_targets[i]]
+                else:
+                    by_symbol.setdefault(symbol, set()).add(names[self.edge_targets[i]])
+        cls = DFA if kind == KIND_DFA else NFA
+        return cls([names[i] for i in self.declared], [symbols[i] for i in self.alphabet],
+                   transitions, None if self.initial is None else names[self.initial],
+                   [names[i] for i in self.finals])
+
+    def close(self):
+        for name in ('state_offsets', 'symbol_offsets', 'strings', 'declared', 'alphabet',
+                     'finals', 'row_offsets', 'edge_symbols', 'edge_targets'):
+            section = getattr(self, name)
+            if isinstance(section, memoryview):
+                section.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def load_binary(filename):
+    return MappedAutomaton(filename)
+
+def text_to_binary(source, destination):
+    write_store_binary(read_automaton_store(source), destination)
+
+def binary_to_text(source, destination):
+    with load_binary(source) as mapped, open(destination, 'w') as f:
+        names = [mapped.state_name(i) for i in range(mapped.num_states)]
+        symbols = [mapped.symbol_name(i) for i in range(mapped.num_symbols)]
+        f.write('alfabeto:' + ','.join(symbols[i] for i in mapped.alphabet) + '\n')
+        f.write('estados:' + ','.join(names[i] for i in mapped.declared) + '\n')
+        f.write('inicial:' + ('' if mapped.initial is None else names[mapped.initial]) + '\n')
+        f.write('finais:' + ','.join(names[i] for i in mapped.finals) + '\n')
+        f.write('transicoes\n')
+        lines = []
+        for state_id, name in enumerate(names):
+            for i in range(mapped.row_offsets[state_id], mapped.row_offsets[state_id + 1]):
+                lines.append(f"{name},{names[mapped.edge_targets[i]]},{symbols[mapped.edge_symbols[i]]}\n")
+            if len(lines) >= 4096:
+                f.write(''.join(lines))
+                lines.clear()
+        f.write(''.join(lines))
+
+# Compact automata: state and symbol names are interned to integer ids, an
+# NFA keeps its transitions in CSR arrays (rows sorted by symbol) and a DFA
+# in a dense array('i') table with -1 for a missing transition. The
+# states/alphabet/initial_state/final_states/transitions attributes are
+# read-only views built on access, so print_automaton and the conversion
+# functions accept compact automata unchanged; to_automaton() gives back a
+# mutable NFA or DFA.
+# State names concatenated into one string with an offset table, sliced out
+# on access; a list of separate str objects would cost more than the edges.
+class NameTable:
+    __slots__ = ('text', 'offsets')
+
+    def __init__(self, names):
+        self.text = ''.join(names)
+        self.offsets = array('I', [0])
+        for name in names:
+            self.offsets.append(self.offsets[-1] + len(name))
+
+    def __getitem__(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        text = self.text
+        offsets = self.offsets
+        return (text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1))
+
+class CompactNFA:
+    __slots__ = ('state_names', 'symbol_names', 'declared', 'alphabet_ids', 'initial', 'finals',
+                 'row_offsets', 'edge_symbols', 'edge_targets', '_state_ids', '_symbol_ids',
+                 '_closures')
+
+    def __init__(self, store):
+        # Interned first: a state or symbol that only appears in these lines
+        # must have a name and a row like the others
+        self.declared = array('I', (store.state(name) for name in store.states))
+        self.alphabet_ids = array('I', (store.symbol(name) for name in store.alphabet))
+        self.finals = array('I', (store.state(name) for name in store.final_states))
+        self.initial = -1 if store.initial_state is None else store.state(store.initial_state)
+        self.state_names = NameTable(store.state_names)
+        self.symbol_names = store.symbol_names
+        self.row_offsets, self.edge_symbols, self.edge_targets = store_to_csr(store)
+        self._state_ids = None
+        self._symbol_ids = None
+        self._closures = None
+
+    @property
+    def states(self):
+        return frozenset(self.state_names[i] for i in self.declared)
+
+    @property
+    def alphabet(self):
+        return frozenset(self.symbol_names[i] for i in self.alphabet_ids)
+
+    @property
+    def initial_state(self):
+        return None if self.initial < 0 else self.state_names[self.initial]
+
+    @property
+    def final_states(self):
+        return frozenset(self.state_names[i] for i in self.finals)
+
+    @property
+    def transitions(self):
+        return _CompactTransitions(self)
+
+    def state_id(self, name):
+        if self._state_ids is None:
+            self._state_ids = {state: i for i, state in enumerate(self.state_names)}
+        return self._state_ids.get(name)
+
+    def symbol_id(self, name):
+        if self._symbol_ids is None:
+            self._symbol_ids = {symbol: i for i, symbol in enumerate(self.symbol_names)}
+        return self._symbol_ids.get(name)
+
+    def row_symbols(self, state_id):
+        symbols = self.edge_symbols
+        result = []
+        for i in range(self.row_offsets[state_id], self.row_offsets[state_id + 1]):
+            if not result or result[-1] != symbols[i]:
+                result.append(symbols[i])
+        return result
+
+    def row_targets(self, state_id, symbol_id):
+        names = self.state_names
+        symbols = self.edge_symbols
+        return frozenset(names[self.edge_targets[i]]
+                         for i in range(self.row_offsets[state_id], self.row_offsets[state_id + 1])
+                         if symbols[i] == symbol_id)
+
+    def row_size(self, state_id):
+        return self.row_offsets[state_id + 1] - self.row_offsets[state_id]
+
+    def epsilon_closures(self):
+        if self._closures is None:
+            self._closures = compute_epsilon_closures(self)
+        return self._closures
+
+    def to_automaton(self):
+        transitions = {}
+        for state, by_symbol in self.transitions.items():
+            transitions[state] = {symbol: set(targets) for symbol, targets in by_symbol.items()}
+        return NFA(self.states, self.alphabet, transitions, self.initial_state, self.final_states)
+
+class CompactDFA:
+    __slots__ = ('state_names', 'symbol_names', 'declared', 'alphabet_ids', 'initial', 'finals',
+                 'table', '_state_ids', '_symbol_ids')
+
+    def __init__(self, store):
+        if not store_is_deterministic(store):
+            raise ValueError("Automaton is not deterministic")
+        # Interned first, as in CompactNFA
+        self.declared = array('I', (store.state(name) for name in store.states))
+        self.alphabet_ids = array('I', (store.symbol(name) for name in store.alphabet))
+        self.finals = array('I', (store.state(name) for name in store.final_states))
+        self.initial = -1 if store.initial_state is None else store.state(store.initial_state)
+        self.state_names = NameTable(store.state_names)
+        self.symbol_names = store.symbol_names
+        num_symbols = len(self.symbol_names)
+        self.table = array('i', [-1]) * (len(self.state_names) * num_symbols)
+        for source, target, symbol in zip(store.sources, store.targets, store.symbols):
+            self.table[source * num_symbols + symbol] = target
+        self._state_ids = None
+        self._symbol_ids = None
+
+    states = CompactNFA.states
+    alphabet = CompactNFA.alphabet
+    initial_state = CompactNFA.initial_state
+    final_states = CompactNFA.final_states
+    transitions = CompactNFA.transitions
+    state_id = CompactNFA.state_id
+    symbol_id = CompactNFA.symbol_id
+
+    def row_symbols(self, state_id):
+        num_symbols = len(self.symbol_names)
+        base = state_id * num_symbols
+        return [symbol for symbol in range(num_symbols) if self.table[base + symbol] >= 0]
+
+    def row_targets(self, state_id, symbol_id):
+        target = self.table[state_id * len(self.symbol_names) + symbol_id]
+        return None if target < 0 else self.state_names[target]
+
+    def row_size(self, state_id):
+        return len(self.row_symbols(state_id))
+
+    def to_automaton(self):
+        transitions = {state: dict(by_symbol) for state, by_symbol in self.transitions.items()}
+        return DFA(self.states, self.alphabet, transitions, self.initial_state, self.final_states)
+
+# Mapping views standing in for the dict of dicts: a state maps to a row only
+# when it has transitions, an NFA row maps symbols to frozensets of target
+# names and a DFA row maps them to a single name.
+class _CompactTransitions(Mapping):
+    __slots__ = ('automaton',)
+
+    def __init__(self, automaton):
+        self.automaton = automaton
+
+    def __getitem__(self, state):
+        state_id = self.automaton.state_id(state)
+        if state_id is None or not self.automaton.row_size(state_id):
+            raise KeyError(state)
+        return _CompactRow(self.automaton, state_id)
+
+    def __iter__(self):
+        automaton = self.automaton
+        for state_id, name in enumerate(automaton.state_names):
+            if automaton.row_size(state_id):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class _CompactRow(Mapping):
+    __slots__ = ('automaton', 'state_id')
+
+    def __init__(self, automaton, state_id):
+        self.automaton = automaton
+        self.state_id = state_id
+
+    def __getitem__(self, symbol):
+        symbol_id = self.automaton.symbol_id(symbol)
+        targets = None if symbol_id is None else self.automaton.row_targets(self.state_id, symbol_id)
+        if not targets:
+            raise KeyError(symbol)
+        return targets
+
+    def __iter__(self):
+        names = self.automaton.symbol_names
+        return (names[symbol] for symbol in self.automaton.row_symbols(self.state_id))
+
+    def __len__(self):
+        return len(self.automaton.row_symbols(self.state_id))
+
+def compact_automaton(automaton):
+    if isinstance(automaton, (CompactNFA, CompactDFA)):
+        return automaton
+    store = automaton_to_store(automaton)
+    return CompactDFA(store) if isinstance(automaton, DFA) else CompactNFA(store)
+
+def read_compact_automaton(filename):
+    return CompactNFA(read_automaton_store(filename))
 
 def read_regular_expression(filename):
     with open(filename, 'r') as f:
-        lines = f.readlines()
+        return parse_regular_expression(f)
 
+def parse_regular_expression(lines):
     alphabet = []
     expression = ''
     for line in lines:
@@ -79,20 +764,249 @@ def read_regular_expression(filename):
             expression = line[len('expressao:'):].strip()
     return alphabet, expression
 
-# Thompson's construction: RE to NFA
-class State:
-    def __init__(self):
-        self.transitions = defaultdict(set)
-        self.epsilon_transitions = set()
+# Regular expressions: symbols of the alphabet, '|', '*', parentheses and an
+# optional explicit '.' for concatenation. '()' and empty alternatives denote
+# the empty word; an empty expression denotes the empty language.
+CONCAT, UNION, STAR, EPSILON, LPAREN = range(5)
+PRECEDENCE = {UNION: 1, CONCAT: 2}
 
-def regex_to_nfa(regex, alphabet):
-    # (Implementation remains the same)
-    # ...
-    # (For brevity, I have not included this part again)
-    pass
+# Shunting-yard in a single pass, inserting the implicit concatenations on
+# the fly. Symbols are emitted as strings and operators as the ints above.
+def regex_to_postfix(regex, alphabet):
+    symbols = set(alphabet) - {''}
+    output = []
+    operators = []
+    opened = []  # positions of the open parentheses
+
+    def push_operator(operator):
+        while operators and operators[-1] != LPAREN and PRECEDENCE[operators[-1]] >= PRECEDENCE[operator]:
+            output.append(operators.pop())
+        operators.append(operator)
+
+    after_operand = False
+    after_dot = False
+    for position, c in enumerate(regex):
+        if c in symbols:
+            if after_operand:
+                push_operator(CONCAT)
+            output.append(c)
+            after_operand = True
+        elif c == '(':
+            if after_operand:
+                push_operator(CONCAT)
+            operators.append(LPAREN)
+            opened.append(position)
+            after_operand = False
+        elif c == ')':
+            if not opened:
+                raise ValueError(f"Unbalanced ')' at position {position}")
+            if after_dot:
+                raise ValueError(f"Missing operand after '.' at position {position}")
+            if not after_operand:
+                output.append(EPSILON)
+            while operators[-1] != LPAREN:
+                output.append(operators.pop())
+            operators.pop()
+            opened.pop()
+            after_operand = True
+        elif c == '|':
+            if after_dot:
+                raise ValueError(f"Missing operand after '.' at position {position}")
+            if not after_operand:
+                output.append(EPSILON)
+            push_operator(UNION)
+            after_operand = False
+        elif c == '*':
+            if not after_operand:
+                raise ValueError(f"Missing operand for '*' at position {position}")
+            output.append(STAR)
+        elif c == '.':
+            if not after_operand:
+                raise ValueError(f"Missing operand for '.' at position {position}")
+            push_operator(CONCAT)
+            after_operand = False
+            after_dot = True
+            continue
+        elif c.isspace():
+            continue
+        else:
+            raise ValueError(f"Invalid symbol '{c}' at position {position}")
+        after_dot = False
+    if opened:
+        raise ValueError(f"Unbalanced '(' at position {opened[-1]}")
+    if after_dot:
+        raise ValueError("Missing operand after '.' at end of expression")
+    if not after_operand and (output or operators):
+        output.append(EPSILON)
+    while operators:
+        output.append(operators.pop())
+    return output
+
+# Thompson's construction into integer-indexed arrays: every state has at
+# most one symbol edge (symbol id and target) or up to two epsilon edges,
+# and states are numbered in creation order. Several expressions can be
+# built into the same arrays.
+class ThompsonArrays:
+    def __init__(self, alphabet):
+        self.symbols = sorted(set(alphabet) - {''})
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.symbol = array('i')
+        self.target = array('i')
+        self.epsilon1 = array('i')
+        self.epsilon2 = array('i')
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def new_state(self):
+        self.symbol.append(-1)
+        self.target.append(-1)
+        self.epsilon1.append(-1)
+        self.epsilon2.append(-1)
+        return len(self.symbol) - 1
+
+    # Returns the (start, end) states of the fragment, or None for the empty
+    # language
+    def build(self, postfix):
+        starts = []
+        ends = []
+        new_state = self.new_state
+        symbol_ids = self.symbol_ids
+        symbol, target = self.symbol, self.target
+        epsilon1, epsilon2 = self.epsilon1, self.epsilon2
+        for token in postfix:
+            if token.__class__ is str:
+                start = new_state()
+                end = new_state()
+                symbol[start] = symbol_ids[token]
+                target[start] = end
+                starts.append(start)
+                ends.append(end)
+            elif token == CONCAT:
+                end = ends.pop()
+                start = starts.pop()
+                epsilon1[ends[-1]] = start
+                ends[-1] = end
+            elif token == STAR:
+                start = new_state()
+                end = new_state()
+                epsilon1[start] = starts[-1]
+                epsilon2[start] = end
+                epsilon1[ends[-1]] = starts[-1]
+                epsilon2[ends[-1]] = end
+                starts[-1] = start
+                ends[-1] = end
+            elif token == UNION:
+                start = new_state()
+                end = new_state()
+                epsilon1[start] = starts[-2]
+                epsilon2[start] = starts.pop()
+                epsilon1[ends.pop()] = end
+                epsilon1[ends[-1]] = end
+                starts[-1] = start
+                ends[-1] = end
+            else:  # EPSILON: a single state is both start and end
+                state = new_state()
+                starts.append(state)
+                ends.append(state)
+        if not starts:
+            return None
+        return starts[-1], ends[-1]
+
+    def to_nfa(self, alphabet, initial, finals):
+        names = [f'q{i}' for i in range(len(self))]
+        transitions = {}
+        for i, name in enumerate(names):
+            if self.symbol[i] >= 0:
+                transitions[name] = {self.symbols[self.symbol[i]]: {names[self.target[i]]}}
+            elif self.epsilon1[i] >= 0:
+                targets = {names[self.epsilon1[i]]}
+                if self.epsilon2[i] >= 0:
+                    targets.add(names[self.epsilon2[i]])
+                transitions[name] = {'': targets}
+        return NFA(names, alphabet, transitions, names[initial], [names[i] for i in finals])
+
+# Glushkov (position automaton) construction over the same postfix: one state
+# per symbol occurrence plus the initial q0, and no epsilon transitions.
+# The stack holds (nullable, first, last) per subexpression; each first/last
+# list belongs to a single stack entry, so unions extend lists in place.
+def glushkov_nfa(postfix, alphabet):
+    position_symbols = [None]  # position 0 is the initial state
+    follow = [None]
+    stack = []
+    for token in postfix:
+        if token.__class__ is str:
+            position = len(position_symbols)
+            position_symbols.append(token)
+            follow.append(set())
+            stack.append((False, [position], [position]))
+        elif token == CONCAT:
+            nullable2, first2, last2 = stack.pop()
+            nullable1, first1, last1 = stack.pop()
+            for position in last1:
+                follow[position].update(first2)
+            if nullable1:
+                first1.extend(first2)
+            if nullable2:
+                last2.extend(last1)
+            stack.append((nullable1 and nullable2, first1, last2))
+        elif token == UNION:
+            nullable2, first2, last2 = stack.pop()
+            nullable1, first1, last1 = stack.pop()
+            first1.extend(first2)
+            last1.extend(last2)
+            stack.append((nullable1 or nullable2, first1, last1))
+        elif token == STAR:
+            nullable, first, last = stack.pop()
+            for position in last:
+                follow[position].update(first)
+            stack.append((True, first, last))
+        else:  # EPSILON
+            stack.append((True, [], []))
+    names = [f'q{i}' for i in range(len(position_symbols))]
+    if not stack:
+        return NFA(names, alphabet, {}, names[0], [])
+    nullable, first, last = stack.pop()
+    follow[0] = first
+    transitions = {}
+    for position, targets in enumerate(follow):
+        if not targets:
+            continue
+        by_symbol = transitions[names[position]] = {}
+        for target in targets:
+            symbol = position_symbols[target]
+            if symbol in by_symbol:
+                by_symbol[symbol].add(names[target])
+            else:
+                by_symbol[symbol] = {names[target]}
+    final_states = [names[position] for position in last]
+    if nullable:
+        final_states.append(names[0])
+    return NFA(names, alphabet, transitions, names[0], final_states)
+
+@timed_phase('regex_to_nfa')
+def regex_to_nfa(regex, alphabet, strategy='thompson'):
+    postfix = regex_to_postfix(regex, alphabet)
+    if strategy == 'glushkov':
+        return glushkov_nfa(postfix, alphabet)
+    if strategy != 'thompson':
+        raise ValueError(f"Unknown strategy: {strategy}")
+    arrays = ThompsonArrays(alphabet)
+    fragment = arrays.build(postfix)
+    if fragment is None:
+        return arrays.to_nfa(alphabet, arrays.new_state(), [])
+    start, end = fragment
+    return arrays.to_nfa(alphabet, start, [end])
 
 # Subset construction: NFA to DFA
-def nfa_to_dfa(nfa):
+@timed_phase('subset_construction')
+def nfa_to_dfa(nfa, engine='sets'):
+    if engine == 'bitset':
+        return nfa_to_dfa_bitset(nfa)
+    if engine == 'parallel':
+        return nfa_to_dfa_parallel(nfa)
+    if engine != 'sets':
+        raise ValueError(f"Unknown engine: {engine}")
     # Map frozenset of NFA states to DFA state names
     state_name_mapping = {}
     state_count = 0
@@ -114,11 +1028,14 @@ def nfa_to_dfa(nfa):
     dfa_states.add(initial_state_set)
     if nfa.final_states & initial_state_set:
         dfa_final_states.add(initial_state)
+    metrics = _metrics
     while unmarked_states:
+        if metrics is not None:
+            metrics.peak('frontier', len(unmarked_states))
         current_set = unmarked_states.popleft()
         current_state = get_state_name(current_set)
         dfa_transitions[current_state] = {}
-        for symbol in nfa.alphabet:
+        for symbol in sorted(nfa.alphabet):  # Sorted for stable D-numbering
             if symbol == '':
                 continue  # Skip epsilon
             next_states = move(nfa, current_set, symbol)
@@ -132,44 +1049,2502 @@ def nfa_to_dfa(nfa):
                 if nfa.final_states & closure:
                     dfa_final_states.add(next_state)
             dfa_transitions[current_state][symbol] = next_state
+    if metrics is not None:
+        record_subsets(metrics, state_name_mapping, dfa_transitions)
+    dfa = DFA(state_name_mapping.values(), nfa.alphabet, dfa_transitions, initial_state, dfa_final_states)
+    return dfa
+
+def record_subsets(metrics, state_name_mapping, dfa_transitions):
+    metrics.count('subsets', len(state_name_mapping))
+    metrics.count('dfa_transitions', sum(len(row) for row in dfa_transitions.values()))
+
+# Bitset subset construction: NFA states are interned to integer ids and a
+# subset is an int whose bit i is set when state i belongs to it.
+class BitsetNFA:
+    def __init__(self, nfa):
+        self.ids = {}
+        self.names = []
+        for state in nfa.states:
+            self.intern(state)
+        if nfa.initial_state is not None:
+            self.intern(nfa.initial_state)
+        for state, by_symbol in nfa.transitions.items():
+            self.intern(state)
+            for targets in by_symbol.values():
+                for target in targets:
+                    self.intern(target)
+        self.symbols = sorted(symbol for symbol in nfa.alphabet if symbol != '')
+        self.closures = self._compute_closures(nfa)
+        # successors[symbol][i] is the epsilon closure of move({i}, symbol)
+        self.successors = {}
+        for symbol in self.symbols:
+            self.successors[symbol] = self.successor_row(nfa, symbol)
+        self.final_mask = 0
+        for state in nfa.final_states:
+            if state in self.ids:
+                self.final_mask |= 1 << self.ids[state]
+        if nfa.initial_state is None:
+            self.initial_mask = 0
+        else:
+            self.initial_mask = self.closures[self.ids[nfa.initial_state]]
+
+    def intern(self, name):
+        state_id = self.ids.get(name)
+        if state_id is None:
+            state_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return state_id
+
+    def successor_row(self, nfa, symbol):
+        row = [0] * len(self.names)
+        for state, by_symbol in nfa.transitions.items():
+            mask = 0
+            for target in by_symbol.get(symbol, ()):
+                mask |= self.closures[self.ids[target]]
+            row[self.ids[state]] = mask
+        return row
+
+    def _compute_closures(self, nfa):
+        table = nfa.epsilon_closures()
+        masks = {}  # States of one epsilon SCC share their closure and mask
+        closures = []
+        for name in self.names:
+            closure = table.get(name)
+            if closure is None:
+                closures.append(1 << self.ids[name])
+                continue
+            mask = masks.get(closure)
+            if mask is None:
+                mask = 0
+                for state in closure:
+                    mask |= 1 << self.ids[state]
+                masks[closure] = mask
+            closures.append(mask)
+        return closures
+
+    def members(self, mask):
+        bits = bin(mask)[:1:-1]
+        result = []
+        i = bits.find('1')
+        while i >= 0:
+            result.append(i)
+            i = bits.find('1', i + 1)
+        return result
+
+    def step(self, members, symbol):
+        row = self.successors[symbol]
+        result = 0
+        for i in members:
+            result |= row[i]
+        return result
+
+    def to_names(self, mask):
+        return frozenset(self.names[i] for i in self.members(mask))
+
+def nfa_to_dfa_bitset(nfa):
+    bits = BitsetNFA(nfa)
+    state_name_mapping = {}  # subset bitmask -> DFA state name
+    initial_state = state_name_mapping[bits.initial_mask] = 'D0'
+    dfa_transitions = {}
+    dfa_final_states = set()
+    if bits.initial_mask & bits.final_mask:
+        dfa_final_states.add(initial_state)
+    unmarked_states = deque([bits.initial_mask])
+    metrics = _metrics
+    while unmarked_states:
+        if metrics is not None:
+            metrics.peak('frontier', len(unmarked_states))
+        current_mask = unmarked_states.popleft()
+        current_state = state_name_mapping[current_mask]
+        members = bits.members(current_mask)
+        transitions = dfa_transitions[current_state] = {}
+        for symbol in bits.symbols:
+            next_mask = bits.step(members, symbol)
+            if not next_mask:
+                continue
+            next_state = state_name_mapping.get(next_mask)
+            if next_state is None:
+                next_state = f'D{len(state_name_mapping)}'
+                state_name_mapping[next_mask] = next_state
+                unmarked_states.append(next_mask)
+                if next_mask & bits.final_mask:
+                    dfa_final_states.add(next_state)
+            transitions[symbol] = next_state
+    if metrics is not None:
+        record_subsets(metrics, state_name_mapping, dfa_transitions)
     dfa = DFA(state_name_mapping.values(), nfa.alphabet, dfa_transitions, initial_state, dfa_final_states)
     return dfa
 
+# Budgeted subset construction (the bitset BFS, same D-numbering). The
+# memory budget is checked against an estimate of the subset table: the
+# size of each mask plus a fixed per-state and per-transition overhead.
+# When a budget runs out, on_limit decides the outcome: 'raise' raises
+# DeterminizationLimitError carrying the partial DFA, 'partial' returns it
+# (subsets still pending become states without transitions, so it accepts
+# a subset of the language) and 'lazy' returns a LazyDFA over the NFA. The
+# stats dict, if given, receives the diagnostics either way.
+SUBSET_OVERHEAD = 400
+TRANSITION_OVERHEAD = 100
+
+class DeterminizationLimitError(ValueError):
+    def __init__(self, message, partial, stats):
+        super().__init__(message)
+        self.partial = partial
+        self.stats = stats
+
+@timed_phase('subset_construction')
+def nfa_to_dfa_guarded(nfa, max_states=None, max_memory=None, max_seconds=None,
+                       progress=None, progress_interval=1000, on_limit='raise', stats=None):
+    if on_limit not in ('raise', 'partial', 'lazy'):
+        raise ValueError(f"Unknown on_limit: {on_limit}")
+    start_time = time.perf_counter()
+    bits = BitsetNFA(nfa)
+    state_name_mapping = {bits.initial_mask: 'D0'}
+    dfa_transitions = {}
+    dfa_final_states = set()
+    if bits.initial_mask & bits.final_mask:
+        dfa_final_states.add('D0')
+    unmarked_states = deque([bits.initial_mask])
+    memory = SUBSET_OVERHEAD + sys.getsizeof(bits.initial_mask)
+    limit = None
+    processed = 0
+    metrics = _metrics
+    while unmarked_states:
+        if metrics is not None:
+            metrics.peak('frontier', len(unmarked_states))
+        if max_seconds is not None and time.perf_counter() - start_time > max_seconds:
+            limit = f"time budget of {max_seconds} s exceeded"
+            break
+        if progress is not None and processed % progress_interval == 0:
+            progress(len(state_name_mapping), len(unmarked_states))
+        current_mask = unmarked_states.popleft()
+        members = bits.members(current_mask)
+        transitions = dfa_transitions[state_name_mapping[current_mask]] = {}
+        for symbol in bits.symbols:
+            next_mask = bits.step(members, symbol)
+            if not next_mask:
+                continue
+            next_state = state_name_mapping.get(next_mask)
+            if next_state is None:
+                # Checked before naming, so a partial DFA never has more
+                # than max_states states
+                if max_states is not None and len(state_name_mapping) >= max_states:
+                    limit = f"state budget of {max_states} exceeded"
+                    break
+                next_state = f'D{len(state_name_mapping)}'
+                state_name_mapping[next_mask] = next_state
+                unmarked_states.append(next_mask)
+                memory += SUBSET_OVERHEAD + sys.getsizeof(next_mask)
+                if next_mask & bits.final_mask:
+                    dfa_final_states.add(next_state)
+            transitions[symbol] = next_state
+            memory += TRANSITION_OVERHEAD
+        if limit is not None:
+            break
+        processed += 1
+        if max_memory is not None and memory > max_memory:
+            limit = f"memory budget of {max_memory} bytes exceeded"
+            break
+    if progress is not None:
+        progress(len(state_name_mapping), len(unmarked_states))
+    diagnostics = {'subsets': len(state_name_mapping), 'processed': processed,
+                   'pending': len(unmarked_states), 'estimated_memory': memory,
+                   'seconds': time.perf_counter() - start_time, 'limit': limit}
+    if stats is not None:
+        stats.update(diagnostics)
+    if _metrics is not None:
+        record_subsets(_metrics, state_name_mapping, dfa_transitions)
+    if limit is not None and on_limit == 'lazy':
+        return LazyDFA(nfa)
+    for mask in unmarked_states:
+        dfa_transitions[state_name_mapping[mask]] = {}
+    dfa = DFA(state_name_mapping.values(), nfa.alphabet, dfa_transitions, 'D0', dfa_final_states)
+    if limit is not None and on_limit == 'raise':
+        raise DeterminizationLimitError(f"Determinization stopped: {limit}", dfa, diagnostics)
+    return dfa
+
+# Incremental subset construction for NFAs edited in small steps. The
+# successor masks of every subset reached by the last run are kept per
+# symbol; an edit marks the NFA states whose closed successor rows changed,
+# and the next update() recomputes only the cached subsets that contain one
+# of them. The BFS naming pass always runs in full, so the result is exactly
+# the DFA nfa_to_dfa would build for the edited NFA.
+class IncrementalDFA:
+    def __init__(self, nfa):
+        self.nfa = nfa
+        self.bits = BitsetNFA(nfa)
+        self.state_name_mapping = {}  # subset bitmask -> DFA state name
+        self.rows = {}  # subset bitmask -> {symbol: successor bitmask}
+        self.dirty = {}  # symbol -> mask of states whose successor row changed
+        self.epsilon_changed = False
+        self.computed = 0
+        self.reused = 0
+        self.dfa = None
+        self.update()
+
+    def _intern(self, state):
+        bits = self.bits
+        if state in bits.ids:
+            return bits.ids[state]
+        state_id = bits.intern(state)
+        bits.closures.append(1 << state_id)
+        for row in bits.successors.values():
+            row.append(0)
+        return state_id
+
+    def _refresh(self, state, symbol):
+        bits = self.bits
+        state_id = bits.ids[state]
+        row = bits.successors[symbol]
+        mask = 0
+        for target in self.nfa.transitions.get(state, {}).get(symbol, ()):
+            mask |= bits.closures[bits.ids[target]]
+        if row[state_id] != mask:
+            row[state_id] = mask
+            self.dirty[symbol] = self.dirty.get(symbol, 0) | 1 << state_id
+
+    def _edit_transition(self, from_state, to_state, symbol):
+        self._intern(from_state)
+        self._intern(to_state)
+        if symbol == '':
+            self.epsilon_changed = True
+        elif symbol in self.bits.successors and not self.epsilon_changed:
+            self._refresh(from_state, symbol)
+
+    def add_transition(self, from_state, to_state, symbol):
+        self.nfa.add_transition(from_state, to_state, symbol)
+        self._edit_transition(from_state, to_state, symbol)
+
+    def remove_transition(self, from_state, to_state, symbol):
+        self.nfa.remove_transition(from_state, to_state, symbol)
+        self._edit_transition(from_state, to_state, symbol)
+
+    def add_final_state(self, state):
+        self.nfa.final_states.add(state)
+        self.bits.final_mask |= 1 << self._intern(state)
+
+    def remove_final_state(self, state):
+        self.nfa.final_states.discard(state)
+        if state in self.bits.ids:
+            self.bits.final_mask &= ~(1 << self.bits.ids[state])
+
+    def add_symbol(self, symbol):
+        if symbol == '' or symbol in self.nfa.alphabet:
+            return
+        self.nfa.alphabet.add(symbol)
+        bits = self.bits
+        bits.symbols = sorted(bits.symbols + [symbol])
+        bits.successors[symbol] = bits.successor_row(self.nfa, symbol)
+        self.dirty[symbol] = -1  # Cached rows may hold a stale column
+
+    def remove_symbol(self, symbol):
+        if symbol == '' or symbol not in self.nfa.alphabet:
+            return
+        self.nfa.alphabet.discard(symbol)
+        self.bits.symbols.remove(symbol)
+        del self.bits.successors[symbol]
+
+    # Epsilon edits can change any closure: recompute the closed successor
+    # rows and mark the states whose rows differ from the old ones.
+    def _rebuild_rows(self):
+        bits = self.bits
+        bits.closures = bits._compute_closures(self.nfa)
+        for symbol in bits.symbols:
+            old_row = bits.successors[symbol]
+            new_row = bits.successor_row(self.nfa, symbol)
+            changed = 0
+            for state_id, (old, new) in enumerate(zip(old_row, new_row)):
+                if old != new:
+                    changed |= 1 << state_id
+            if changed:
+                self.dirty[symbol] = self.dirty.get(symbol, 0) | changed
+            bits.successors[symbol] = new_row
+        initial_state = self.nfa.initial_state
+        bits.initial_mask = 0 if initial_state is None else bits.closures[bits.ids[initial_state]]
+        self.epsilon_changed = False
+
+    def update(self):
+        if self.epsilon_changed:
+            self._rebuild_rows()
+        bits = self.bits
+        old_rows = self.rows
+        columns = [(symbol, self.dirty.get(symbol, 0)) for symbol in bits.symbols]
+        rows = {}
+        state_name_mapping = {bits.initial_mask: 'D0'}
+        dfa_transitions = {}
+        dfa_final_states = set()
+        if bits.initial_mask & bits.final_mask:
+            dfa_final_states.add('D0')
+        unmarked_states = deque([bits.initial_mask])
+        while unmarked_states:
+            current_mask = unmarked_states.popleft()
+            transitions = dfa_transitions[state_name_mapping[current_mask]] = {}
+            row = rows[current_mask] = old_rows.get(current_mask) or {}
+            members = None
+            for symbol, dirty in columns:
+                next_mask = row.get(symbol)
+                if next_mask is None or current_mask & dirty:
+                    if members is None:
+                        members = bits.members(current_mask)
+                        self.computed += 1
+                    next_mask = row[symbol] = bits.step(members, symbol)
+                if not next_mask:
+                    continue
+                next_state = state_name_mapping.get(next_mask)
+                if next_state is None:
+                    next_state = f'D{len(state_name_mapping)}'
+                    state_name_mapping[next_mask] = next_state
+                    unmarked_states.append(next_mask)
+                    if next_mask & bits.final_mask:
+                        dfa_final_states.add(next_state)
+                transitions[symbol] = next_state
+            if members is None:
+                self.reused += 1
+        self.rows = rows
+        self.dirty = {}
+        self.state_name_mapping = state_name_mapping
+        self.dfa = DFA(state_name_mapping.values(), self.nfa.alphabet, dfa_transitions, 'D0', dfa_final_states)
+        return self.dfa
+
+# Parallel subset construction: the BFS frontier is expanded one level at a
+# time across a process pool. The closed successors of BitsetNFA live in one
+# shared memory block as sparse lists: an offsets array with a slot per
+# (symbol, state) followed by the target state indices, so the block grows
+# with the number of transitions rather than with states squared. Workers
+# get chunks of subset masks, decode the lists a chunk touches straight from
+# the block (keeping them for that chunk only) and return the successor
+# masks; the coordinator names new subsets in frontier order, which is
+# exactly the sequential BFS order, so the D-numbering does not depend on
+# the number of workers.
+_parallel_table = None
+
+def _parallel_init(name, num_states, num_rows, num_targets):
+    global _parallel_table
+    memory = shared_memory.SharedMemory(name=name)
+    offsets = memory.buf[:8 * (num_rows + 1)].cast('q')
+    targets = memory.buf[8 * (num_rows + 1):8 * (num_rows + 1) + 4 * num_targets].cast('I')
+    _parallel_table = (memory, num_states, offsets, targets)
+
+def _parallel_expand(masks, num_symbols):
+    memory, num_states, offsets, targets = _parallel_table
+    row_bytes = max(1, (num_states + 7) // 8)
+    rows = {}  # Rows decoded for this chunk only
+    results = []
+    for mask in masks:
+        bits = bin(mask)[:1:-1]
+        members = []
+        i = bits.find('1')
+        while i >= 0:
+            members.append(i)
+            i = bits.find('1', i + 1)
+        successors = []
+        for k in range(num_symbols):
+            base = k * num_states
+            result = 0
+            for i in members:
+                row = rows.get(base + i)
+                if row is None:
+                    bitmap = bytearray(row_bytes)
+                    for target in targets[offsets[base + i]:offsets[base + i + 1]]:
+                        bitmap[target >> 3] |= 1 << (target & 7)
+                    row = rows[base + i] = int.from_bytes(bitmap, 'little')
+                result |= row
+            successors.append(result)
+        results.append(successors)
+    return results
+
+def nfa_to_dfa_parallel(nfa, workers=None, chunk_size=64):
+    bits = BitsetNFA(nfa)
+    num_states = len(bits.names)
+    num_symbols = len(bits.symbols)
+    num_rows = num_symbols * num_states
+    offsets = array('q', [0])
+    targets = array('I')
+    for symbol in bits.symbols:
+        for mask in bits.successors[symbol]:
+            row = bin(mask)[:1:-1]
+            i = row.find('1')
+            while i >= 0:
+                targets.append(i)
+                i = row.find('1', i + 1)
+            offsets.append(len(targets))
+    memory = shared_memory.SharedMemory(create=True, size=8 * len(offsets) + 4 * len(targets))
+    try:
+        memory.buf[:8 * len(offsets)] = offsets.tobytes()
+        memory.buf[8 * len(offsets):8 * len(offsets) + 4 * len(targets)] = targets.tobytes()
+        state_name_mapping = {bits.initial_mask: 'D0'}
+        dfa_transitions = {}
+        dfa_final_states = set()
+        if bits.initial_mask & bits.final_mask:
+            dfa_final_states.add('D0')
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_parallel_init,
+                                 initargs=(memory.name, num_states, num_rows, len(targets))) as executor:
+            frontier = [bits.initial_mask]
+            while frontier:
+                if _metrics is not None:
+                    _metrics.peak('frontier', len(frontier))
+                chunks = [frontier[i:i + chunk_size] for i in range(0, len(frontier), chunk_size)]
+                expanded = executor.map(_parallel_expand, chunks, [num_symbols] * len(chunks))
+                next_frontier = []
+                for chunk, results in zip(chunks, expanded):
+                    for current_mask, successors in zip(chunk, results):
+                        transitions = dfa_transitions[state_name_mapping[current_mask]] = {}
+                        for symbol, next_mask in zip(bits.symbols, successors):
+                            if not next_mask:
+                                continue
+                            next_state = state_name_mapping.get(next_mask)
+                            if next_state is None:
+                                next_state = f'D{len(state_name_mapping)}'
+                                state_name_mapping[next_mask] = next_state
+                                next_frontier.append(next_mask)
+                                if next_mask & bits.final_mask:
+                                    dfa_final_states.add(next_state)
+                            transitions[symbol] = next_state
+                frontier = next_frontier
+    finally:
+        memory.close()
+        memory.unlink()
+    if _metrics is not None:
+        record_subsets(_metrics, state_name_mapping, dfa_transitions)
+    dfa = DFA(state_name_mapping.values(), nfa.alphabet, dfa_transitions, 'D0', dfa_final_states)
+    return dfa
+
+# Epsilon closures of every NFA state, computed in one pass: Tarjan's
+# algorithm condenses the epsilon graph into strongly connected components and
+# emits them sinks first, so each component's closure is its members plus the
+# already computed closures of the components it reaches.
+@timed_phase('epsilon_closure')
+def compute_epsilon_closures(nfa):
+    epsilon = {}
+    for state, by_symbol in nfa.transitions.items():
+        targets = by_symbol.get('')
+        if targets:
+            epsilon[state] = list(targets)
+    closures = {}
+    index = {}
+    lowlink = {}
+    scc_stack = []
+    on_stack = set()
+    for root in epsilon:
+        if root in index:
+            continue
+        work = [(root, iter(epsilon.get(root, ())))]
+        index[root] = lowlink[root] = len(index)
+        scc_stack.append(root)
+        on_stack.add(root)
+        while work:
+            state, targets = work[-1]
+            for target in targets:
+                if target not in index:
+                    index[target] = lowlink[target] = len(index)
+                    scc_stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, iter(epsilon.get(target, ()))))
+                    break
+                if target in on_stack:
+                    lowlink[state] = min(lowlink[state], index[target])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[state])
+                if lowlink[state] == index[state]:
+                    members = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == state:
+                            break
+                    closure = set(members)
+                    for member in members:
+                        for target in epsilon.get(member, ()):
+                            if target not in closure:
+                                closure |= closures[target]
+                    closure = frozenset(closure)
+                    for member in members:
+                        closures[member] = closure
+    return closures
+
 def epsilon_closure(nfa, states):
-    stack = list(states)
-    closure = set(states)
-    while stack:
-        state = stack.pop()
-        for next_state in nfa.transitions.get(state, {}).get('', []):
-            if next_state not in closure:
-                closure.add(next_state)
-                stack.append(next_state)
+    if _metrics is not None:
+        _metrics.count('closure_calls')
+    table = nfa.epsilon_closures()
+    closure = set()
+    for state in states:
+        if state not in closure:
+            closure.update(table.get(state, (state,)))
     return closure
 
 def move(nfa, states, symbol):
+    if _metrics is not None:
+        _metrics.count('move_calls')
     next_states = set()
     for state in states:
         for next_state in nfa.transitions.get(state, {}).get(symbol, []):
             next_states.add(next_state)
     return next_states
 
-# DFA to Regular Expression (State Elimination)
-def dfa_to_re(dfa):
-    # (Implementation remains the same)
-    # ...
-    # (For brevity, I have not included this part again)
+# DFA files are read as NFAs, so a DFA transition may be a one-element set
+def dfa_successor(dfa, state, symbol):
+    target = dfa.transitions.get(state, {}).get(symbol)
+    if isinstance(target, (set, frozenset)):
+        if len(target) > 1:
+            raise ValueError(f"Nondeterministic transition: {state},{symbol}")
+        target = next(iter(target), None)
+    return target
+
+# Hopcroft's partition refinement: DFA to minimal DFA
+@timed_phase('minimization')
+def minimize_dfa(dfa, stats=None):
+    symbols = sorted(symbol for symbol in dfa.alphabet if symbol != '')
+    # Number the reachable states; id len(order) is the implicit dead state
+    order = [dfa.initial_state]
+    ids = {dfa.initial_state: 0}
+    for state in order:
+        for symbol in symbols:
+            target = dfa_successor(dfa, state, symbol)
+            if target is not None and target not in ids:
+                ids[target] = len(order)
+                order.append(target)
+    dead = len(order)
+    delta = {}
+    inverse = {}
+    for symbol in symbols:
+        row = [dead] * (dead + 1)
+        preds = [[] for _ in range(dead + 1)]
+        for i, state in enumerate(order):
+            target = dfa_successor(dfa, state, symbol)
+            if target is not None:
+                row[i] = ids[target]
+        for i, target in enumerate(row):
+            preds[target].append(i)
+        delta[symbol] = row
+        inverse[symbol] = preds
+
+    finals = {ids[state] for state in dfa.final_states if state in ids}
+    blocks = [block for block in (set(finals), set(range(dead + 1)) - finals) if block]
+    block_of = [0] * (dead + 1)
+    for b, block in enumerate(blocks):
+        for i in block:
+            block_of[i] = b
+    pending = set()
+    if len(blocks) == 2:
+        smaller = 0 if len(blocks[0]) <= len(blocks[1]) else 1
+        pending = {(smaller, symbol) for symbol in symbols}
+    worklist = sorted(pending)
+    while worklist:
+        splitter = worklist.pop()
+        pending.discard(splitter)
+        b, symbol = splitter
+        preds = inverse[symbol]
+        touched = defaultdict(set)
+        for target in blocks[b]:
+            for i in preds[target]:
+                touched[block_of[i]].add(i)
+        for y, hit in touched.items():
+            block = blocks[y]
+            if len(hit) == len(block):
+                continue
+            block -= hit
+            z = len(blocks)
+            blocks.append(hit)
+            for i in hit:
+                block_of[i] = z
+            for a in symbols:
+                if (y, a) in pending:
+                    split = (z, a)
+                else:
+                    split = (z, a) if len(hit) <= len(block) else (y, a)
+                pending.add(split)
+                worklist.append(split)
+
+    # Name the blocks in BFS order from the initial block, dropping the block
+    # of states that cannot reach a final state (it contains the dead state)
+    dead_block = block_of[dead]
+    names = {block_of[0]: 'D0'}
+    queue = deque([block_of[0]])
+    transitions = {}
+    while queue:
+        b = queue.popleft()
+        current = transitions[names[b]] = {}
+        if b == dead_block:
+            continue
+        representative = next(iter(blocks[b]))
+        for symbol in symbols:
+            target = block_of[delta[symbol][representative]]
+            if target == dead_block:
+                continue
+            if target not in names:
+                names[target] = f'D{len(names)}'
+                queue.append(target)
+            current[symbol] = names[target]
+    final_states = {names[b] for b in names if blocks[b] & finals}
+    minimal = DFA(names.values(), dfa.alphabet, transitions, 'D0', final_states)
+    if _metrics is not None:
+        _metrics.count('blocks', len(blocks))
+    if stats is not None:
+        stats['states_before'] = len(dfa.states)
+        stats['states_after'] = len(minimal.states)
+    return minimal
+
+def nfa_to_minimal_dfa(nfa, engine='sets', stats=None):
+    dfa = nfa_to_dfa(nfa, engine)
+    return minimize_dfa(dfa, stats)
+
+# Product constructions over DFAs. A missing transition goes to an implicit
+# dead state, written None in a product pair; only the pairs reachable from
+# the initial pair are built, in BFS order, and named D0, D1, ... Symbols in
+# only one alphabet lead the other automaton to its dead state. The pair of
+# dead states is dropped unless it accepts.
+def product_dfa(first, second, accept):
+    symbols = sorted((first.alphabet | second.alphabet) - {''})
+    keep_dead = accept(False, False)  # e.g. a complement accepts in the dead pair
+    initial = (first.initial_state, second.initial_state)
+    names = {initial: 'D0'}
+    transitions = {}
+    final_states = set()
+    queue = deque([initial])
+    while queue:
+        pair = queue.popleft()
+        p, q = pair
+        name = names[pair]
+        if accept(p in first.final_states, q in second.final_states):
+            final_states.add(name)
+        row = transitions[name] = {}
+        for symbol in symbols:
+            target = (None if p is None else dfa_successor(first, p, symbol),
+                      None if q is None else dfa_successor(second, q, symbol))
+            if target == (None, None) and not keep_dead:
+                continue
+            target_name = names.get(target)
+            if target_name is None:
+                target_name = names[target] = f'D{len(names)}'
+                queue.append(target)
+            row[symbol] = target_name
+    return DFA(names.values(), symbols, transitions, 'D0', final_states)
+
+def dfa_intersection(first, second):
+    return product_dfa(first, second, lambda a, b: a and b)
+
+def dfa_union(first, second):
+    return product_dfa(first, second, lambda a, b: a or b)
+
+def dfa_difference(first, second):
+    return product_dfa(first, second, lambda a, b: a and not b)
+
+def dfa_complement(dfa, alphabet=None):
+    symbols = sorted(set(dfa.alphabet if alphabet is None else alphabet) - {''})
+    empty = DFA([], symbols, {}, None, [])
+    return product_dfa(dfa, empty, lambda a, b: not a)
+
+# Integer table of a DFA for the equivalence check: states numbered in BFS
+# order from the initial state, one row per state with a target id per
+# symbol, the last id being the dead state.
+def _dfa_table(dfa, symbols):
+    order = [dfa.initial_state]
+    ids = {dfa.initial_state: 0}
+    rows = []
+    for state in order:
+        row = []
+        for symbol in symbols:
+            target = None if state is None else dfa_successor(dfa, state, symbol)
+            if target is None:
+                row.append(-1)
+                continue
+            target_id = ids.get(target)
+            if target_id is None:
+                target_id = ids[target] = len(order)
+                order.append(target)
+            row.append(target_id)
+        rows.append(row)
+    dead = len(rows)
+    rows.append([dead] * len(symbols))
+    for row in rows:
+        for k, target in enumerate(row):
+            if target < 0:
+                row[k] = dead
+    finals = [state in dfa.final_states for state in order] + [False]
+    return rows, finals
+
+def _as_dfa(automaton):
+    return automaton if is_deterministic(automaton) else nfa_to_dfa(automaton, 'bitset')
+
+# Hopcroft-Karp: merge the two initial states in a union-find over the
+# states of both DFAs and propagate along every symbol; the languages differ
+# exactly when a merge joins a final and a non-final state. Each merge
+# removes a class, so the check is near linear in the number of states. On
+# a difference, a BFS over the product pairs finds a shortest word accepted
+# by exactly one of them. NFAs are determinized first.
+def dfa_equivalence(first, second):
+    first, second = _as_dfa(first), _as_dfa(second)
+    symbols = sorted((first.alphabet | second.alphabet) - {''})
+    rows_a, finals_a = _dfa_table(first, symbols)
+    rows_b, finals_b = _dfa_table(second, symbols)
+    offset = len(rows_a)
+    parent = list(range(offset + len(rows_b)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    equivalent = finals_a[0] == finals_b[0]
+    parent[offset] = 0
+    stack = [(0, 0)]
+    while stack and equivalent:
+        p, q = stack.pop()
+        row_a, row_b = rows_a[p], rows_b[q]
+        for k in range(len(symbols)):
+            p2, q2 = row_a[k], row_b[k]
+            r1, r2 = find(p2), find(q2 + offset)
+            if r1 == r2:
+                continue
+            if finals_a[p2] != finals_b[q2]:
+                equivalent = False
+                break
+            parent[r2] = r1
+            stack.append((p2, q2))
+    if equivalent:
+        return True, None
+    return False, _shortest_difference(rows_a, finals_a, rows_b, finals_b, symbols)
+
+def _shortest_difference(rows_a, finals_a, rows_b, finals_b, symbols):
+    parents = {(0, 0): None}
+    queue = deque([(0, 0)])
+    while queue:
+        pair = queue.popleft()
+        p, q = pair
+        if finals_a[p] != finals_b[q]:
+            word = []
+            while parents[pair] is not None:
+                pair, symbol = parents[pair]
+                word.append(symbol)
+            return ''.join(reversed(word))
+        for k, symbol in enumerate(symbols):
+            target = (rows_a[p][k], rows_b[q][k])
+            if target not in parents:
+                parents[target] = (pair, symbol)
+                queue.append(target)
+    return None
+
+def dfa_equivalent(first, second):
+    return dfa_equivalence(first, second)[0]
+
+# Table-driven matcher: the DFA is compiled to a flat row-major array('i')
+# with one column per symbol plus a last column for symbols outside the
+# alphabet. Cells hold the target row offset (state * width) so matching is
+# a single index per input symbol; missing transitions go to a dead row.
+class _Columns(dict):
+    def __init__(self, columns, other):
+        super().__init__(columns)
+        self.other = other
+
+    def __missing__(self, key):
+        return self.other
+
+class CompiledDFA:
+    def __init__(self, automaton):
+        if isinstance(automaton, (NFA, CompactNFA)):
+            automaton = nfa_to_dfa(automaton, 'bitset')
+        self.symbols = sorted(symbol for symbol in automaton.alphabet if symbol != '')
+        self.width = width = len(self.symbols) + 1
+        self.columns = _Columns({symbol: i for i, symbol in enumerate(self.symbols)}, width - 1)
+        states = [automaton.initial_state]
+        states.extend(sorted(set(automaton.states) - {automaton.initial_state}))
+        rows = {state: i for i, state in enumerate(states)}
+        dead = len(states)
+        self.dead = dead * width
+        self.initial = 0
+        self.table = array('i', [self.dead]) * ((dead + 1) * width)
+        for state in states:
+            for symbol, column in self.columns.items():
+                target = dfa_successor(automaton, state, symbol)
+                if target is not None:
+                    self.table[rows[state] * width + column] = rows[target] * width
+        self.accepting = bytearray(dead + 1)
+        for state in automaton.final_states:
+            if state in rows:
+                self.accepting[rows[state]] = 1
+        # Single-character symbols can be mapped to columns with str.translate
+        self._translation = None
+        if width <= 256 and all(len(symbol) == 1 for symbol in self.symbols):
+            self._translation = _Columns({ord(symbol): chr(i) for symbol, i in self.columns.items()},
+                                         chr(width - 1))
+
+    def accepts(self, s):
+        table = self.table
+        columns = self.columns
+        state = self.initial
+        for symbol in s:
+            state = table[state + columns[symbol]]
+        return bool(self.accepting[state // self.width])
+
+    def accepts_many(self, strings):
+        return [self.accepts(s) for s in strings]
+
+    # Vectorized over batches of equal-length strings when NumPy is available;
+    # results keep the input order.
+    def accepts_batch(self, strings):
+        strings = list(strings)
+        numpy = load_numpy()
+        if numpy is None or self._translation is None:
+            return self.accepts_many(strings)
+        by_length = defaultdict(list)
+        for i, s in enumerate(strings):
+            by_length[len(s)].append(i)
+        table = numpy.frombuffer(self.table, dtype=numpy.int32)
+        accepting = numpy.frombuffer(self.accepting, dtype=numpy.uint8)
+        results = [False] * len(strings)
+        for length, indices in by_length.items():
+            encoded = ''.join(strings[i] for i in indices).translate(self._translation)
+            columns = numpy.frombuffer(encoded.encode('latin-1'), dtype=numpy.uint8)
+            columns = columns.reshape(len(indices), length).astype(numpy.int32)
+            states = numpy.full(len(indices), self.initial, dtype=numpy.int32)
+            for k in range(length):
+                states = table[states + columns[:, k]]
+            for i, accepted in zip(indices, accepting[states // self.width]):
+                results[i] = bool(accepted)
+        return results
+
+# Lazy DFA (determinize on demand): subset states are built only when an
+# input reaches them. A row is (subset mask, {symbol: next row}), so a cached
+# step is one dict lookup. When the table reaches max_states it is flushed;
+# if flushes come faster than thrash_factor input symbols per cached state,
+# the rest of that input is matched by plain NFA simulation over bitsets.
+class LazyDFA:
+    def __init__(self, nfa, max_states=10000, thrash_factor=10):
+        self.bits = BitsetNFA(nfa)
+        self.max_states = max_states
+        self.thrash_factor = thrash_factor
+        self.rows = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.fallbacks = 0
+        self.simulated_steps = 0
+        self._steps_since_flush = 0
+
+    def _row(self, mask):
+        row = self.rows.get(mask)
+        if row is None:
+            if len(self.rows) >= self.max_states:
+                self.evictions += len(self.rows)
+                self.flushes += 1
+                self.rows.clear()
+            row = self.rows[mask] = (mask, {})
+        return row
+
+    def _step(self, mask, symbol):
+        if symbol not in self.bits.successors:
+            return 0
+        return self.bits.step(self.bits.members(mask), symbol)
+
+    def accepts(self, s):
+        row = self._row(self.bits.initial_mask)
+        steps = 0
+        misses = 0
+        flushes = self.flushes
+        mask = None
+        symbols = iter(s)
+        for symbol in symbols:
+            next_row = row[1].get(symbol)
+            if next_row is None:
+                misses += 1
+                next_row = self._row(self._step(row[0], symbol))
+                if self.flushes != flushes:
+                    flushes = self.flushes
+                    if self._steps_since_flush + steps < self.thrash_factor * self.max_states:
+                        mask = next_row[0]
+                        steps += 1
+                        break
+                    self._steps_since_flush = -steps
+                row[1][symbol] = next_row
+            row = next_row
+            steps += 1
+        self.hits += steps - misses
+        self.misses += misses
+        self._steps_since_flush += steps
+        if mask is None:
+            return bool(row[0] & self.bits.final_mask)
+        self.fallbacks += 1
+        for symbol in symbols:
+            mask = self._step(mask, symbol)
+            self.simulated_steps += 1
+        return bool(mask & self.bits.final_mask)
+
+    def accepts_many(self, strings):
+        return [self.accepts(s) for s in strings]
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'flushes': self.flushes,
+            'fallbacks': self.fallbacks,
+            'simulated_steps': self.simulated_steps,
+            'cached_states': len(self.rows),
+        }
+
+# Multi-pattern scanner. All patterns are built into one ThompsonArrays
+# below a shared start state with an epsilon move to each pattern, and the
+# NFA is determinized lazily with the bitset construction. A row is
+# (mask, tag, {symbol: row}, tag bits); the tag lists the ids of the
+# patterns with a final state in the subset, the tag bits hold their
+# indexes. mode='match' reports the patterns matching a
+# whole line. mode='search' gives the start state a loop on every symbol,
+# so the automaton reads Σ*p, and reports the patterns ending anywhere in
+# the line; a character outside the alphabet restarts the scan there.
+class MultiPatternScanner:
+    def __init__(self, patterns, alphabet, mode='search', max_states=100000):
+        if mode not in ('match', 'search'):
+            raise ValueError(f"Unknown mode: {mode}")
+        if isinstance(patterns, dict):
+            self.ids, regexes = list(patterns), list(patterns.values())
+        else:
+            regexes = list(patterns)
+            self.ids = list(range(len(regexes)))
+        self.mode = mode
+        self.max_states = max_states
+        arrays = ThompsonArrays(alphabet)
+        start = arrays.new_state()
+        starts = []
+        owners = {}  # final Thompson state -> pattern index
+        for index, regex in enumerate(regexes):
+            fragment = arrays.build(regex_to_postfix(regex, alphabet))
+            if fragment is not None:
+                starts.append(fragment[0])
+                owners[fragment[1]] = index
+        nfa = arrays.to_nfa(alphabet, start, list(owners))
+        names = sorted(nfa.states, key=lambda name: int(name[1:]))
+        by_symbol = nfa.transitions[names[start]] = {'': {names[i] for i in starts}}
+        if mode == 'search':
+            for symbol in arrays.symbols:
+                by_symbol[symbol] = {names[start]}
+        nfa.invalidate_closures()
+        self.nfa = nfa
+        self.bits = BitsetNFA(nfa)
+        self.owner = {self.bits.ids[names[i]]: index for i, index in owners.items()}
+        self.rows = {}
+        self.flushes = 0
+        self.initial = self._row(self.bits.initial_mask)
+
+    # Like LazyDFA, a full table is dropped. The old rows lose their links so
+    # that one still in use by a scan does not keep the old table alive, and
+    # the initial row is rebuilt in the new one. The initial row is never
+    # missing from the table, so mask is not the initial mask here.
+    def _flush(self):
+        self.flushes += 1
+        for row in self.rows.values():
+            row[2].clear()
+        self.rows.clear()
+        self.initial = self._row(self.bits.initial_mask)
+
+    def _row(self, mask):
+        row = self.rows.get(mask)
+        if row is None:
+            if len(self.rows) >= self.max_states:
+                self._flush()
+            tag_bits = 0
+            for i in self.bits.members(mask & self.bits.final_mask):
+                tag_bits |= 1 << self.owner[i]
+            row = self.rows[mask] = (mask, self._tag(tag_bits), {}, tag_bits)
+        return row
+
+    def _tag(self, tag_bits):
+        return tuple(self.ids[i] for i in self.bits.members(tag_bits))
+
+    def _next(self, row, symbol):
+        if symbol not in self.bits.successors:
+            return None
+        next_row = row[2][symbol] = self._row(self.bits.step(self.bits.members(row[0]), symbol))
+        return next_row
+
+    def scan_line(self, line):
+        row = self.initial
+        if self.mode == 'match':
+            for symbol in line:
+                next_row = row[2].get(symbol) or self._next(row, symbol)
+                if next_row is None:
+                    return ()
+                row = next_row
+            return row[1]
+        found = row[3]
+        for symbol in line:
+            next_row = row[2].get(symbol) or self._next(row, symbol)
+            row = self.initial if next_row is None else next_row
+            found |= row[3]
+        return self._tag(found) if found else ()
+
+    # Yields (line number, pattern ids) for every line with a match. The
+    # stream may be a file, an iterable of lines or of arbitrary chunks.
+    def scan(self, stream):
+        if isinstance(stream, str):
+            stream = (stream,)
+        lineno = 0
+        parts = []
+        for chunk in stream:
+            if not chunk:
+                continue  # An empty chunk must not open a last line
+            if '\n' not in chunk:
+                parts.append(chunk)
+                continue
+            lines = chunk.split('\n')
+            if parts:
+                parts.append(lines[0])
+                lines[0] = ''.join(parts)
+            rest = lines.pop()
+            parts = [rest] if rest else []
+            for line in lines:
+                lineno += 1
+                matches = self.scan_line(line.rstrip('\r'))
+                if matches:
+                    yield lineno, matches
+        if parts:
+            matches = self.scan_line(''.join(parts).rstrip('\r'))
+            if matches:
+                yield lineno + 1, matches
+
+    # The complete tagged DFA: D-names in BFS order and a tag per state
+    def tagged_dfa(self):
+        bits = self.bits
+        names = {bits.initial_mask: 'D0'}
+        transitions = {}
+        tags = {}
+        queue = deque([bits.initial_mask])
+        while queue:
+            mask = queue.popleft()
+            name = names[mask]
+            tags[name] = self._row(mask)[1]
+            row = transitions[name] = {}
+            members = bits.members(mask)
+            for symbol in bits.symbols:
+                next_mask = bits.step(members, symbol)
+                if not next_mask:
+                    continue
+                if next_mask not in names:
+                    names[next_mask] = f'D{len(names)}'
+                    queue.append(next_mask)
+                row[symbol] = names[next_mask]
+        finals = {name for name, tag in tags.items() if tag}
+        return DFA(names.values(), self.nfa.alphabet, transitions, 'D0', finals), tags
+
+# Hash-consed regular expression AST: structurally equal nodes are the same
+# object, so nodes compare and hash by identity. The smart constructors below
+# normalize as they build (e.r = r, r|r = r, (r*)* = r*, ...), and a node is
+# rendered to text only when the final expression is needed.
+REGEX_EMPTY, REGEX_EPSILON, REGEX_SYMBOL, REGEX_CONCAT, REGEX_UNION, REGEX_STAR = range(6)
+
+class Regex:
+    __slots__ = ('kind', 'args', 'size', 'nullable', 'text', 'derivatives', 'appended', '__weakref__')
+
+    def __init__(self, kind, args, size, nullable):
+        self.kind = kind
+        self.args = args
+        self.size = size  # number of symbols and operators in the rendered text
+        self.nullable = nullable
+        self.text = None
+        self.derivatives = None
+        self.appended = None
+
+    def __repr__(self):
+        return f"Regex({render_regex(self)!r})"
+
+_regex_table = weakref.WeakValueDictionary()
+
+def _intern_regex(kind, args, size, nullable):
+    key = (kind, args)
+    node = _regex_table.get(key)
+    if node is None:
+        node = _regex_table[key] = Regex(kind, args, size, nullable)
+    return node
+
+EMPTY_REGEX = Regex(REGEX_EMPTY, (), 0, False)
+EPSILON_REGEX = Regex(REGEX_EPSILON, (), 1, True)
+
+def regex_symbol(symbol):
+    return _intern_regex(REGEX_SYMBOL, symbol, 1, False)
+
+def regex_concat(left, right):
+    if left is EMPTY_REGEX or right is EMPTY_REGEX:
+        return EMPTY_REGEX
+    if left is EPSILON_REGEX:
+        return right
+    if right is EPSILON_REGEX:
+        return left
+    if left.kind == REGEX_CONCAT:
+        # Keep concatenations right-associated. Every suffix of the chain
+        # remembers what it gave followed by right (in appended), so chains
+        # sharing a suffix are only rebuilt down to it.
+        tail = right
+        suffixes = []
+        while left.kind == REGEX_CONCAT:
+            appended = left.appended
+            if appended is not None and tail in appended:
+                right = appended[tail]
+                break
+            suffixes.append(left)
+            left = left.args[1]
+        else:
+            right = regex_concat(left, tail)
+        for suffix in reversed(suffixes):
+            right = regex_concat(suffix.args[0], right)
+            if suffix.appended is None:
+                suffix.appended = {}
+            suffix.appended[tail] = right
+        return right
+    return _intern_regex(REGEX_CONCAT, (left, right), left.size + right.size,
+                         left.nullable and right.nullable)
+
+# factor=False leaves xt|yt apart; derivatives keep their unions flat that way
+def regex_union(*alternatives, factor=True):
+    children = set()
+    for alternative in alternatives:
+        if alternative.kind == REGEX_UNION:
+            children.update(alternative.args)
+        elif alternative is not EMPTY_REGEX:
+            children.add(alternative)
+    if EPSILON_REGEX in children:
+        for child in list(children):
+            if (child.kind == REGEX_CONCAT and child.args[1].kind == REGEX_STAR
+                    and child.args[1].args[0] is child.args[0]):
+                children.discard(child)  # e|rr* = r*
+                children.add(child.args[1])
+        if any(child.nullable and child is not EPSILON_REGEX for child in children):
+            children.discard(EPSILON_REGEX)  # e|r = r when r already matches e
+    tails = {}
+    for child in children if factor else ():
+        if child.kind == REGEX_CONCAT:
+            tails.setdefault(child.args[1], []).append(child)
+    for tail, group in tails.items():
+        if len(group) > 1:  # xt|yt = (x|y)t
+            children.difference_update(group)
+            children.add(regex_concat(regex_union(*(child.args[0] for child in group)), tail))
+    if not children:
+        return EMPTY_REGEX
+    if len(children) == 1:
+        return children.pop()
+    children = frozenset(children)
+    return _intern_regex(REGEX_UNION, children, sum(child.size for child in children) + len(children) - 1,
+                         any(child.nullable for child in children))
+
+def regex_star(inner):
+    if inner is EMPTY_REGEX or inner is EPSILON_REGEX:
+        return EPSILON_REGEX
+    if inner.kind == REGEX_STAR:
+        return inner
+    if inner.kind == REGEX_UNION and EPSILON_REGEX in inner.args:
+        inner = regex_union(*(child for child in inner.args if child is not EPSILON_REGEX))
+    return _intern_regex(REGEX_STAR, (inner,), inner.size + 1, True)
+
+def _regex_children(node):
+    if node.kind in (REGEX_CONCAT, REGEX_UNION, REGEX_STAR):
+        return node.args
+    return ()
+
+_REGEX_PRECEDENCE = {REGEX_UNION: 1, REGEX_CONCAT: 2, REGEX_STAR: 3}
+
+def _wrap(node, precedence):
+    if _REGEX_PRECEDENCE.get(node.kind, 4) < precedence:
+        return f"({node.text})"
+    return node.text
+
+# Renders without recursion (concatenations of long words are deep). The
+# empty word is written '()' and the empty language as ''.
+def render_regex(root):
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node.text is not None:
+            stack.pop()
+            continue
+        pending = [child for child in _regex_children(node) if child.text is None]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        if node.kind == REGEX_EMPTY:
+            node.text = ''
+        elif node.kind == REGEX_EPSILON:
+            node.text = '()'
+        elif node.kind == REGEX_SYMBOL:
+            node.text = node.args
+        elif node.kind == REGEX_CONCAT:
+            node.text = _wrap(node.args[0], 2) + _wrap(node.args[1], 2)
+        elif node.kind == REGEX_UNION:
+            node.text = '|'.join(sorted(child.text for child in node.args))
+        else:
+            node.text = _wrap(node.args[0], 3) + '*'
+    return root.text
+
+class RegexLimitError(ValueError):
     pass
 
-def print_automaton(automaton):
-    print('alfabeto:' + ','.join(sorted(automaton.alphabet)))
-    print('estados:' + ','.join(automaton.states))
-    print('inicial:' + automaton.initial_state)
-    print('finais:' + ','.join(automaton.final_states))
-    print('transicoes')
-    for state in automaton.transitions:
-        for symbol in automaton.transitions[state]:
-            next_state = automaton.transitions[state][symbol]
-            print(f"{state},{next_state},{symbol}")
+# Builds the AST from the shunting-yard postfix. Pending concatenations are
+# kept as deques of factors (the smaller one is merged into the larger) and
+# folded into right-associated nodes only when an operator needs them, so
+# long words do not rebuild their chain at every symbol.
+def regex_from_postfix(postfix):
+    def build(factors):
+        node = factors.pop()
+        while factors:
+            node = regex_concat(factors.pop(), node)
+        return node
+
+    stack = []
+    for token in postfix:
+        if token.__class__ is str:
+            stack.append(deque([regex_symbol(token)]))
+        elif token == CONCAT:
+            right = stack.pop()
+            left = stack[-1]
+            if len(left) >= len(right):
+                left.extend(right)
+            else:
+                right.extendleft(reversed(left))
+                stack[-1] = right
+        elif token == UNION:
+            right = build(stack.pop())
+            stack[-1] = deque([regex_union(build(stack[-1]), right)])
+        elif token == STAR:
+            stack[-1] = deque([regex_star(build(stack[-1]))])
+        else:  # EPSILON
+            stack.append(deque([EPSILON_REGEX]))
+    if not stack:
+        return EMPTY_REGEX
+    return build(stack.pop())
+
+def parse_regex(regex, alphabet):
+    return regex_from_postfix(regex_to_postfix(regex, alphabet))
+
+# Brzozowski derivative, memoized per node. Derivatives are kept as flat
+# unions of concatenations (d(r)t is distributed over the alternatives of
+# d(r) and never factored back), so each alternative is one of Antimirov's
+# partial derivatives: there are at most as many of them as symbols in the
+# expression, and nested stars no longer produce exponentially many
+# dissimilar derivatives.
+def _derivative_concat(derivative, tail):
+    if derivative.kind == REGEX_UNION:
+        return regex_union(*(regex_concat(child, tail) for child in derivative.args), factor=False)
+    return regex_concat(derivative, tail)
+
+# The nodes whose derivatives d(node) is made of: the heads of a
+# concatenation chain up to the first one that is not nullable (and the last
+# factor when all are), the alternatives of a union, the body of a star.
+def _derivative_inputs(node):
+    kind = node.kind
+    if kind == REGEX_CONCAT:
+        inputs = []
+        current = node
+        while current.kind == REGEX_CONCAT:
+            head = current.args[0]
+            inputs.append(head)
+            if not head.nullable:
+                return inputs
+            current = current.args[1]
+        inputs.append(current)
+        return inputs
+    if kind == REGEX_UNION or kind == REGEX_STAR:
+        return node.args
+    return ()
+
+# Computed without recursion, like render_regex: nested stars and unions can
+# be thousands of levels deep.
+def regex_derivative(root, symbol):
+    derivatives = root.derivatives
+    if derivatives is not None:
+        result = derivatives.get(symbol)
+        if result is not None:
+            return result
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        derivatives = node.derivatives
+        if derivatives is None:
+            derivatives = node.derivatives = {}
+        elif symbol in derivatives:
+            stack.pop()
+            continue
+        pending = [child for child in _derivative_inputs(node)
+                   if child.derivatives is None or symbol not in child.derivatives]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        kind = node.kind
+        if kind == REGEX_SYMBOL:
+            result = EPSILON_REGEX if node.args == symbol else EMPTY_REGEX
+        elif kind == REGEX_CONCAT:
+            # d(r1 r2 ... rn) over the right-associated chain, walking on
+            # while the head is nullable
+            alternatives = []
+            current = node
+            while current.kind == REGEX_CONCAT:
+                head, tail = current.args
+                alternatives.append(_derivative_concat(head.derivatives[symbol], tail))
+                if not head.nullable:
+                    break
+                current = tail
+            else:
+                alternatives.append(current.derivatives[symbol])
+            result = regex_union(*alternatives, factor=False)
+        elif kind == REGEX_UNION:
+            result = regex_union(*(child.derivatives[symbol] for child in node.args), factor=False)
+        elif kind == REGEX_STAR:
+            result = _derivative_concat(node.args[0].derivatives[symbol], node)
+        else:
+            result = EMPTY_REGEX
+        derivatives[symbol] = result
+    return root.derivatives[symbol]
+
+class DerivativeMatcher:
+    def __init__(self, regex, alphabet):
+        self.alphabet = alphabet
+        self.root = parse_regex(regex, alphabet)
+
+    def accepts(self, s):
+        node = self.root
+        for symbol in s:
+            node = regex_derivative(node, symbol)
+            if node is EMPTY_REGEX:
+                return False
+        return node.nullable
+
+    def accepts_many(self, strings):
+        return [self.accepts(s) for s in strings]
+
+    # Each distinct derivative is a DFA state; the empty language is left out
+    # as the implicit dead state. Past max_states or max_seconds the
+    # construction stops with DeterminizationLimitError, carrying the
+    # partial DFA like nfa_to_dfa_guarded.
+    def to_dfa(self, max_states=None, max_seconds=None):
+        start_time = time.perf_counter()
+        symbols = sorted(set(self.alphabet) - {''})
+        names = {self.root: 'D0'}
+        queue = deque([self.root])
+        transitions = {}
+        final_states = set()
+        limit = None
+        while queue and limit is None:
+            if max_seconds is not None and time.perf_counter() - start_time > max_seconds:
+                limit = f"time budget of {max_seconds} s exceeded"
+                break
+            node = queue.popleft()
+            row = transitions[names[node]] = {}
+            if node.nullable:
+                final_states.add(names[node])
+            for symbol in symbols:
+                target = regex_derivative(node, symbol)
+                if target is EMPTY_REGEX:
+                    continue
+                if target not in names:
+                    if max_states is not None and len(names) >= max_states:
+                        limit = f"state budget of {max_states} exceeded"
+                        break
+                    names[target] = f'D{len(names)}'
+                    queue.append(target)
+                row[symbol] = names[target]
+        if limit is not None:
+            for pending in queue:
+                transitions[names[pending]] = {}
+                if pending.nullable:
+                    final_states.add(names[pending])
+            partial = DFA(names.values(), self.alphabet, transitions, 'D0', final_states)
+            raise DeterminizationLimitError(f"Derivative construction stopped: {limit}", partial,
+                                            {'states': len(names), 'pending': len(queue)})
+        return DFA(names.values(), self.alphabet, transitions, 'D0', final_states)
+
+@timed_phase('derivatives')
+def regex_to_dfa(regex, alphabet, max_states=None, max_seconds=None):
+    return minimize_dfa(DerivativeMatcher(regex, alphabet).to_dfa(max_states, max_seconds))
+
+# DFA to Regular Expression (State Elimination)
+# States are numbered in BFS order from the initial state (sorted symbols),
+# then eliminated cheapest first: cost = in-degree * out-degree plus the size
+# of the expressions on the state's edges, ties broken by BFS number. Any
+# automaton in the text format works, epsilon moves included. The CLI and
+# the menu pass RE_MAX_SIZE as max_size: the result can grow exponentially
+# with the number of states.
+RE_MAX_SIZE = 1_000_000
+
+@timed_phase('state_elimination')
+def dfa_to_re(dfa, max_size=None, stats=None, max_seconds=None):
+    start_time = time.perf_counter()
+
+    def edges_of(state):
+        by_symbol = dfa.transitions.get(state, {})
+        for symbol in sorted(by_symbol):
+            targets = by_symbol[symbol]
+            if isinstance(targets, str):
+                targets = (targets,)
+            for target in sorted(targets):
+                yield symbol, target
+
+    order = [dfa.initial_state]
+    ids = {dfa.initial_state: 0}
+    for state in order:
+        for symbol, target in edges_of(state):
+            if target not in ids:
+                ids[target] = len(order)
+                order.append(target)
+    n = len(order)
+    start, accept = n, n + 1
+    out = [{} for _ in range(n + 2)]
+    inn = [{} for _ in range(n + 2)]
+
+    def add_edge(i, j, regex):
+        existing = out[i].get(j)
+        if existing is not None:
+            regex = regex_union(existing, regex)
+        out[i][j] = inn[j][i] = regex
+        if max_size is not None and regex.size > max_size:
+            raise RegexLimitError(f"Regular expression exceeds {max_size} symbols")
+
+    for i, state in enumerate(order):
+        for symbol, target in edges_of(state):
+            add_edge(i, ids[target], EPSILON_REGEX if symbol == '' else regex_symbol(symbol))
+    add_edge(start, 0, EPSILON_REGEX)
+    for state in dfa.final_states:
+        if state in ids:
+            add_edge(ids[state], accept, EPSILON_REGEX)
+
+    # States that cannot reach a final state contribute nothing
+    useful = {accept}
+    queue = deque([accept])
+    while queue:
+        for i in inn[queue.popleft()]:
+            if i not in useful:
+                useful.add(i)
+                queue.append(i)
+    remaining = set()
+    for i in range(n):
+        if i in useful:
+            remaining.add(i)
+        else:
+            for j in out[i]:
+                del inn[j][i]
+            for j in inn[i]:
+                del out[j][i]
+            out[i] = {}
+            inn[i] = {}
+
+    def cost(k):
+        degree_in = len(inn[k]) - (k in inn[k])
+        degree_out = len(out[k]) - (k in out[k])
+        weight = sum(regex.size for regex in out[k].values()) + sum(regex.size for regex in inn[k].values())
+        return degree_in * degree_out + weight
+
+    costs = {k: cost(k) for k in remaining}
+    heap = [(c, k) for k, c in costs.items()]
+    heapq.heapify(heap)
+    eliminations = 0
+    metrics = _metrics
+    while heap:
+        c, k = heapq.heappop(heap)
+        if k not in remaining or costs[k] != c:
+            continue
+        remaining.discard(k)
+        eliminations += 1
+        if metrics is not None:
+            metrics.count('eliminations')
+        if max_seconds is not None and time.perf_counter() - start_time > max_seconds:
+            raise RegexLimitError(f"State elimination exceeded {max_seconds} s")
+        loop = out[k].pop(k, None)
+        inn[k].pop(k, None)
+        loop = EPSILON_REGEX if loop is None else regex_star(loop)
+        for i, into_k in inn[k].items():
+            del out[i][k]
+            prefix = regex_concat(into_k, loop)
+            for j, from_k in out[k].items():
+                add_edge(i, j, regex_concat(prefix, from_k))
+        for j in out[k]:
+            del inn[j][k]
+        neighbours = set(inn[k]) | set(out[k])
+        out[k] = {}
+        inn[k] = {}
+        for i in neighbours & remaining:
+            costs[i] = cost(i)
+            heapq.heappush(heap, (costs[i], i))
+
+    result = out[start].get(accept, EMPTY_REGEX)
+    text = render_regex(result)
+    if metrics is not None:
+        metrics.count('regex_size', result.size)
+    if stats is not None:
+        stats['states'] = n
+        stats['eliminations'] = eliminations
+        stats['size'] = result.size
+        stats['length'] = len(text)
+        stats['seconds'] = time.perf_counter() - start_time
+    return text
+
+# Output writers. Each format is a generator of text chunks of about
+# CHUNK_LINES lines, so an automaton is written with a few large writes and
+# never held in memory as one string. sort=True orders states naturally
+# (D2 before D10), symbols and targets, for byte-identical output.
+CHUNK_LINES = 8192
+WRITE_BUFFER = 1 << 20
+
+def natural_key(name):
+    return (len(name), name)
+
+def _output_rows(automaton, sort):
+    transitions = automaton.transitions
+    if not sort:
+        return transitions.items()
+    return ((state, {symbol: targets if isinstance(targets, str) else sorted(targets, key=natural_key)
+                     for symbol, targets in sorted(transitions[state].items())})
+            for state in sorted(transitions, key=natural_key))
+
+def _names(names, sort):
+    return sorted(names, key=natural_key) if sort else names
+
+def iter_automaton_text(automaton, sort=False):
+    lines = ['alfabeto:' + ','.join(sorted(automaton.alphabet)),
+             'estados:' + ','.join(_names(automaton.states, sort)),
+             'inicial:' + (automaton.initial_state or ''),
+             'finais:' + ','.join(_names(automaton.final_states, sort)),
+             'transicoes']
+    count = 0
+    for state, by_symbol in _output_rows(automaton, sort):
+        for symbol, targets in by_symbol.items():
+            if isinstance(targets, str):
+                lines.append(f"{state},{targets},{symbol}")  # DFA transition
+            else:
+                for target in targets:
+                    lines.append(f"{state},{target},{symbol}")
+        if len(lines) >= CHUNK_LINES:
+            count += len(lines)
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    count += len(lines)
+    if lines:
+        yield '\n'.join(lines) + '\n'
+    if _metrics is not None:
+        _metrics.count('output_lines', count)
+
+def iter_automaton_json(automaton, sort=False):
+    quoted = {}
+
+    def quote(name):
+        text = quoted.get(name)
+        if text is None:
+            text = quoted[name] = json.dumps(name, ensure_ascii=False)
+        return text
+
+    yield (f'{{"kind": "{"DFA" if isinstance(automaton, (DFA, CompactDFA)) else "NFA"}", '
+           f'"alphabet": [{", ".join(map(quote, sorted(automaton.alphabet)))}], '
+           f'"states": [{", ".join(map(quote, _names(automaton.states, sort)))}], '
+           f'"initial": {json.dumps(automaton.initial_state, ensure_ascii=False)}, '
+           f'"finals": [{", ".join(map(quote, _names(automaton.final_states, sort)))}], '
+           f'"transitions": [')
+    separator = '\n'
+    items = []
+    for state, by_symbol in _output_rows(automaton, sort):
+        source = quote(state)
+        for symbol, targets in by_symbol.items():
+            if isinstance(targets, str):
+                targets = (targets,)
+            for target in targets:
+                items.append(f"{separator}[{source}, {quote(target)}, {quote(symbol)}]")
+                separator = ',\n'
+        if len(items) >= CHUNK_LINES:
+            yield ''.join(items)
+            items = []
+    items.append(']}\n')
+    yield ''.join(items)
+
+def _dot_id(name):
+    return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def iter_automaton_dot(automaton, sort=False):
+    lines = ['digraph automaton {', '  rankdir=LR;', '  node [shape=circle];',
+             '  __start [shape=point, label=""];']
+    for state in _names(automaton.final_states, sort):
+        lines.append(f"  {_dot_id(state)} [shape=doublecircle];")
+    if automaton.initial_state is not None:
+        lines.append(f"  __start -> {_dot_id(automaton.initial_state)};")
+    # Parallel edges between two states are drawn as one with all the labels
+    for state, by_symbol in _output_rows(automaton, sort):
+        labels = {}
+        for symbol, targets in by_symbol.items():
+            if isinstance(targets, str):
+                targets = (targets,)
+            for target in targets:
+                labels.setdefault(target, []).append(symbol or 'ε')
+        for target, symbols in labels.items():
+            lines.append(f"  {_dot_id(state)} -> {_dot_id(target)} [label={_dot_id(','.join(symbols))}];")
+        if len(lines) >= CHUNK_LINES:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    lines.append('}')
+    yield '\n'.join(lines) + '\n'
+
+OUTPUT_FORMATS = {'text': iter_automaton_text, 'json': iter_automaton_json, 'dot': iter_automaton_dot}
+
+def iter_automaton(automaton, output_format='text', sort=False):
+    writer = OUTPUT_FORMATS.get(output_format)
+    if writer is None:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return writer(automaton, sort)
+
+# Writes to a file object or, given a path, to a file opened with a large
+# buffer; chunks are joined until WRITE_BUFFER characters before each write.
+@timed_phase('output')
+def write_automaton(automaton, file, output_format='text', sort=False):
+    chunks = iter_automaton(automaton, output_format, sort)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            write_chunks(chunks, f)
+    else:
+        write_chunks(chunks, file)
+
+def write_chunks(chunks, file):
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= WRITE_BUFFER:
+            file.write(''.join(pending))
+            pending = []
+            size = 0
+    if pending:
+        file.write(''.join(pending))
+
+@timed_phase('output')
+def format_automaton(automaton, output_format='text', sort=False):
+    text = ''.join(iter_automaton(automaton, output_format, sort))
+    return text[:-1] if text.endswith('\n') else text
+
+def print_automaton(automaton, output_format='text', sort=False, file=None):
+    write_automaton(automaton, sys.stdout if file is None else file, output_format, sort)
+
+# Canonical form of an automaton for content-addressed caching. Reachable
+# states are numbered in BFS order from the initial state; the targets of a
+# nondeterministic move are ordered by colour refinement (state signatures
+# refined for at most CANONICAL_ROUNDS rounds: chains such as Thompson NFAs
+# would otherwise need one round per state), so isomorphic automata get the
+# same form whatever their state names or transition order. Targets that
+# refinement cannot tell apart fall back to name order, which only costs
+# cache hits, never correctness. A deterministic automaton needs no
+# refinement: the BFS over sorted symbols is already canonical. With
+# names=True the state names are part of the form.
+CANONICAL_ROUNDS = 4
+
+def canonical_form(automaton, names=False):
+    symbols = sorted(automaton.alphabet)
+
+    def edges(state):
+        by_symbol = automaton.transitions.get(state, {})
+        for symbol in sorted(by_symbol):
+            targets = by_symbol[symbol]
+            if isinstance(targets, str):
+                targets = (targets,)
+            if targets:
+                yield symbol, targets
+
+    finals = set(automaton.final_states)
+    colours = {}
+    if not is_deterministic(automaton):
+        reachable = [automaton.initial_state]
+        index = {automaton.initial_state: 0}
+        moves = []
+        for state in reachable:
+            row = []
+            for symbol, targets in edges(state):
+                for target in targets:
+                    if target not in index:
+                        index[target] = len(reachable)
+                        reachable.append(target)
+                row.append((symbol, [index[target] for target in targets]))
+            moves.append(row)
+        colour = [int(state in finals) for state in reachable]
+        count = len(set(colour))
+        for _ in range(CANONICAL_ROUNDS):
+            signatures = [(colour[i], tuple((symbol, tuple(sorted(colour[t] for t in targets)))
+                                            for symbol, targets in row))
+                          for i, row in enumerate(moves)]
+            ranks = {signature: i for i, signature in enumerate(sorted(set(signatures)))}
+            colour = [ranks[signature] for signature in signatures]
+            if len(ranks) == count:
+                break
+            count = len(ranks)
+        colours = dict(zip(reachable, colour))
+
+    ids = {automaton.initial_state: 0}
+    order = [automaton.initial_state]
+    rows = []
+    for state in order:
+        row = []
+        for symbol, targets in edges(state):
+            target_ids = []
+            for target in sorted(targets, key=lambda t: (colours.get(t, 0), t)):
+                if target not in ids:
+                    ids[target] = len(order)
+                    order.append(target)
+                target_ids.append(ids[target])
+            row.append([symbol, sorted(target_ids)])
+        rows.append([int(state in finals), row])
+    form = {'alphabet': symbols, 'states': rows}
+    if names:
+        form['names'] = order
+    return json.dumps(form, separators=(',', ':'), ensure_ascii=False)
+
+def canonical_hash(automaton, names=False):
+    return hashlib.sha256(canonical_form(automaton, names).encode('utf-8')).hexdigest()
+
+def is_deterministic(automaton):
+    for by_symbol in automaton.transitions.values():
+        for symbol, targets in by_symbol.items():
+            if not isinstance(targets, str) and (symbol == '' or len(targets) > 1):
+                return False
+    return True
+
+# Deterministic serialization used by the cache; serialize_automaton of a
+# cached result equals that of a fresh conversion byte for byte.
+def serialize_automaton(automaton):
+    transitions = []
+    for state, by_symbol in automaton.transitions.items():
+        row = []
+        for symbol, targets in by_symbol.items():
+            row.append([symbol, targets if isinstance(targets, str) else sorted(targets)])
+        transitions.append([state, row])
+    return json.dumps({
+        'kind': 'DFA' if isinstance(automaton, (DFA, CompactDFA)) else 'NFA',
+        'alphabet': sorted(automaton.alphabet),
+        'states': sorted(automaton.states, key=lambda name: (len(name), name)),
+        'initial': automaton.initial_state,
+        'finals': sorted(automaton.final_states),
+        'transitions': transitions,
+    }, separators=(',', ':'), ensure_ascii=False)
+
+def deserialize_automaton(text):
+    data = json.loads(text)
+    transitions = {}
+    for state, row in data['transitions']:
+        by_symbol = transitions[state] = {}
+        for symbol, targets in row:
+            by_symbol[symbol] = targets if isinstance(targets, str) else set(targets)
+    cls = DFA if data['kind'] == 'DFA' else NFA
+    return cls(data['states'], data['alphabet'], transitions, data['initial'], data['finals'])
+
+# Conversion cache: an in-memory LRU in front of an optional directory of
+# <key>.json files, both bounded, keyed by operation, options and the
+# canonical hash of the input (or the tokenized regex plus alphabet).
+class ConversionCache:
+    def __init__(self, directory=None, max_entries=256, max_memory_bytes=64 << 20,
+                 max_disk_bytes=1 << 30):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.json'):
+                    self.disk_bytes += entry.stat().st_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _remember(self, key, value):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        self.memory[key] = value
+        self.memory_bytes += len(value)
+        while self.memory and (len(self.memory) > self.max_entries
+                               or self.memory_bytes > self.max_memory_bytes):
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.directory:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    value = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                value = None
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if not self.directory:
+            return
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(value)
+        try:
+            self.disk_bytes -= os.path.getsize(path)
+        except OSError:
+            pass
+        os.replace(temporary, path)
+        self.disk_bytes += os.path.getsize(path)
+        if self.disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+            self.disk_evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            'entries': len(self.memory),
+            'memory_bytes': self.memory_bytes,
+            'disk_bytes': self.disk_bytes,
+            'evictions': self.evictions,
+            'disk_evictions': self.disk_evictions,
+        }
+
+    def _key(self, operation, options, content):
+        digest = hashlib.sha256()
+        digest.update(f"{operation}\0{json.dumps(options, sort_keys=True)}\0".encode('utf-8'))
+        digest.update(content.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _automaton(self, operation, options, content, convert):
+        key = self._key(operation, options, content)
+        value = self.get(key)
+        if value is None:
+            value = serialize_automaton(convert())
+            self.put(key, value)
+        return deserialize_automaton(value)
+
+    # The subset construction and minimization only see the structure, so
+    # any isomorphic input shares the entry.
+    def nfa_to_dfa(self, nfa, engine='sets'):
+        return self._automaton('nfa2dfa', [], canonical_form(nfa), lambda: nfa_to_dfa(nfa, engine))
+
+    def nfa_to_minimal_dfa(self, nfa, engine='sets'):
+        return self._automaton('minimize', [], canonical_form(nfa),
+                               lambda: nfa_to_minimal_dfa(nfa, engine))
+
+    # dfa_to_re orders nondeterministic targets by name, so such inputs are
+    # keyed with their names.
+    # max_seconds only bounds the work: a result is the same whatever limit
+    # it was computed under, so it is not part of the key
+    def dfa_to_re(self, dfa, max_size=None, max_seconds=None):
+        content = canonical_form(dfa, names=not is_deterministic(dfa))
+        key = self._key('dfa2re', [max_size], content)
+        value = self.get(key)
+        if value is None:
+            value = dfa_to_re(dfa, max_size, max_seconds=max_seconds)
+            self.put(key, value)
+        return value
+
+    # Both regex constructions are functions of the token sequence, and the
+    # derivative DFA of the hash-consed AST
+    def regex_to_nfa(self, regex, alphabet, strategy='thompson'):
+        postfix = regex_to_postfix(regex, alphabet)
+        content = json.dumps([sorted(alphabet), [token if token.__class__ is str else -1 - token
+                                                 for token in postfix]])
+        return self._automaton('re2nfa', [strategy], content,
+                               lambda: regex_to_nfa(regex, alphabet, strategy))
+
+    def regex_to_dfa(self, regex, alphabet, max_states=None, max_seconds=None):
+        content = json.dumps([sorted(alphabet), render_regex(parse_regex(regex, alphabet))])
+        return self._automaton('re2dfa', [], content,
+                               lambda: regex_to_dfa(regex, alphabet, max_states, max_seconds))
+
+# Batch command line interface
+COMMANDS = ('nfa2dfa', 'dfa2re', 're2nfa', 'minimize', 're2dfa')
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(os.path.join(pattern, name) for name in os.listdir(pattern)
+                                if os.path.isfile(os.path.join(pattern, name))))
+        elif glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern)))
+        else:
+            files.append(pattern)
+    return files
+
+# One ConversionCache per cache directory in each process
+_caches = {}
+
+def get_cache(directory):
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = ConversionCache(directory)
+    return cache
+
+def convert_file(command, filename, options=None):
+    return convert_source(command, filename, lambda: read_automaton(filename),
+                          lambda: read_regular_expression(filename), options)
+
+def convert_text(command, text, options=None):
+    lines = text.splitlines()
+    return convert_source(command, '<request>', lambda: parse_automaton(lines, '<request>').to_nfa(),
+                          lambda: parse_regular_expression(lines), options)
+
+# Runs in the worker processes, so every failure is caught and returned
+def convert_source(command, filename, read_nfa, read_regex, options=None):
+    options = options or {}
+    engine = options.get('engine', 'sets')
+    output_format = options.get('output_format') or 'text'
+    sort = options.get('sort', False)
+    cache = get_cache(options['cache_dir']) if options.get('cache_dir') else None
+    result = {'file': filename, 'command': command, 'ok': False}
+    start = time.perf_counter()
+    misses = cache.misses if cache else 0
+    metrics = Metrics() if options.get('stats') else None
+    try:
+        with instrument(metrics) if metrics else contextlib.nullcontext():
+            if command in ('nfa2dfa', 'minimize') and any(
+                    options.get(name) is not None for name in ('max_states', 'max_memory', 'max_seconds')):
+                nfa = read_nfa()
+                stats = {}
+                try:
+                    dfa = nfa_to_dfa_guarded(nfa, options.get('max_states'), options.get('max_memory'),
+                                             options.get('max_seconds'),
+                                             on_limit=options.get('on_limit') or 'raise', stats=stats)
+                finally:
+                    result.update(stats)
+                if command == 'minimize':
+                    dfa = minimize_dfa(dfa, result)
+                result['output'] = format_automaton(dfa, output_format, sort)
+            elif command == 'nfa2dfa':
+                nfa = read_nfa()
+                dfa = cache.nfa_to_dfa(nfa, engine) if cache else nfa_to_dfa(nfa, engine)
+                result['output'] = format_automaton(dfa, output_format, sort)
+            elif command == 'minimize':
+                nfa = read_nfa()
+                if cache:
+                    dfa = cache.nfa_to_minimal_dfa(nfa, engine)
+                else:
+                    stats = {}
+                    dfa = nfa_to_minimal_dfa(nfa, engine, stats)
+                    result.update(stats)
+                result['output'] = format_automaton(dfa, output_format, sort)
+            elif command == 'dfa2re':
+                dfa = read_nfa()
+                if cache:
+                    result['output'] = cache.dfa_to_re(dfa, options.get('max_size'), options.get('max_seconds'))
+                else:
+                    stats = {}
+                    result['output'] = dfa_to_re(dfa, options.get('max_size'), stats,
+                                                 options.get('max_seconds'))
+                    result.update(stats)
+            elif command == 're2dfa':
+                alphabet, expression = read_regex()
+                max_states, max_seconds = options.get('max_states'), options.get('max_seconds')
+                if options.get('method', 'subset') != 'subset':
+                    if cache:
+                        dfa = cache.regex_to_dfa(expression, alphabet, max_states, max_seconds)
+                    else:
+                        dfa = regex_to_dfa(expression, alphabet, max_states, max_seconds)
+                elif max_states is not None or max_seconds is not None:
+                    dfa = minimize_dfa(nfa_to_dfa_guarded(regex_to_nfa(expression, alphabet),
+                                                          max_states, max_seconds=max_seconds))
+                else:
+                    dfa = nfa_to_minimal_dfa(regex_to_nfa(expression, alphabet), 'bitset')
+                result['output'] = format_automaton(dfa, output_format, sort)
+            elif command == 're2nfa':
+                alphabet, expression = read_regex()
+                strategy = options.get('strategy', 'thompson')
+                if cache:
+                    nfa = cache.regex_to_nfa(expression, alphabet, strategy)
+                else:
+                    nfa = regex_to_nfa(expression, alphabet, strategy)
+                result['output'] = format_automaton(nfa, output_format, sort)
+            else:
+                raise ValueError(f"Unknown command: {command}")
+        result['ok'] = True
+    except Exception as error:
+        result['error'] = f"{type(error).__name__}: {error}"
+    if cache:
+        result['cached'] = cache.misses == misses
+    if metrics:
+        result['metrics'] = metrics.as_dict()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def run_batch(command, files, jobs=1, options=None):
+    if jobs <= 1 or len(files) <= 1:
+        for filename in files:
+            yield convert_file(command, filename, options)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(convert_file, command, filename, options) for filename in files]
+        for filename, future in zip(files, futures):
+            try:
+                yield future.result()
+            except Exception as error:  # e.g. a worker process died
+                yield {'file': filename, 'command': command, 'ok': False, 'seconds': 0.0,
+                       'error': f"{type(error).__name__}: {error}"}
+
+# Conversion server: JSON Lines over TCP or a Unix socket. A request is
+# {"id": ..., "command": "nfa2dfa", "input": "<file contents>", "options":
+# {...}, "timeout": seconds}, or "regex" and "alphabet" instead of "input"
+# for the regex commands; {"cancel": id} cancels a request of the same
+# connection and {"command": "stats"} returns the counters. Responses carry
+# the request id and may arrive out of order. Conversions run in a process
+# pool with at most 2 * workers jobs submitted; up to queue_limit more wait
+# for a slot and beyond that requests are refused with "busy". A connection
+# converts at most connection_limit requests at once (see handle_connection),
+# and ok results are kept in an in-memory LRU cache of cache_size entries. A
+# request line may be up to max_request_bytes long. A cancel or a timeout
+# cannot interrupt a worker, so each conversion runs with max_seconds set to
+# the smallest of its timeout, its max_seconds option and the server's
+# max_seconds; a runaway job then stops and gives its slot back. asyncio is
+# imported where the server uses it, which keeps it out of CLI start-up.
+SERVER_OPTIONS = ('engine', 'strategy', 'max_size', 'max_seconds', 'method', 'max_states',
+                  'max_memory', 'on_limit', 'output_format', 'sort', 'stats')
+
+# Request ids are any JSON value; lists and objects are keyed by their
+# canonical JSON text (in a tuple, apart from string ids) so that a cancel
+# line can look them up
+def request_key(request_id):
+    if isinstance(request_id, (str, int, float, bool, type(None))):
+        return request_id
+    return ('json', json.dumps(request_id, sort_keys=True))
+
+class ConversionServer:
+    def __init__(self, workers=None, queue_limit=256, connection_limit=32, cache_size=1024,
+                 cache_dir=None, max_request_bytes=64 * 2 ** 20, max_seconds=60.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_request_bytes = max_request_bytes
+        self.max_seconds = max_seconds
+        self.queue_limit = queue_limit
+        self.connection_limit = connection_limit
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.cache = OrderedDict()
+        self.executor = None
+        self.slots = None
+        self.queued = 0
+        self.running = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def stats(self):
+        return {'workers': self.workers, 'queued': self.queued, 'running': self.running,
+                'cache_entries': len(self.cache), 'hits': self.hits, 'misses': self.misses,
+                'rejected': self.rejected, 'cancelled': self.cancelled}
+
+    # Workers come from a fork server where there is one: forked from this
+    # process they would keep copies of the client sockets open, and a pool
+    # is recreated while serving when a worker dies
+    def _start_executor(self):
+        context = None
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    # Every request that saw the pool break calls this; the first one
+    # replaces it
+    def _replace_executor(self, broken):
+        if self.executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._start_executor()
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        import asyncio
+        self._start_executor()
+        self.slots = asyncio.Semaphore(2 * self.workers)
+        await asyncio.wrap_future(self.executor.submit(int))  # Start a worker up front
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path,
+                                                   limit=self.max_request_bytes)
+        return await asyncio.start_server(self.handle_connection, host, port,
+                                          limit=self.max_request_bytes)
+
+    # Running conversions are not waited for: the workers are terminated
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            for process in multiprocessing.active_children():
+                process.terminate()
+
+    # Control lines (cancel, stats) are handled as soon as they are read.
+    # Conversions wait in their task for the connection's window of
+    # connection_limit; reading stops only while another connection_limit
+    # of them are already waiting, so a cancel can still reach a request
+    # that is waiting or running.
+    async def handle_connection(self, reader, writer):
+        import asyncio
+        tasks = {}
+        window = asyncio.Semaphore(self.connection_limit)
+        backlog = asyncio.Semaphore(2 * self.connection_limit)
+        lock = asyncio.Lock()
+
+        async def send(response):
+            async with lock:
+                if writer.is_closing():
+                    return
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        async def run(request):
+            async with window:
+                await self.respond(request, send)
+
+        # A request cancelled before its task started never ran respond(), so
+        # the cancellation is answered here
+        def finished(task, request_id):
+            key = request_key(request_id)
+            if tasks.get(key) is task:
+                del tasks[key]
+            backlog.release()
+            if task.cancelled():
+                self.cancelled += 1
+                asyncio.create_task(send({'id': request_id, 'ok': False, 'error': 'cancelled'}))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as error:
+                    await send({'id': None, 'ok': False, 'error': f"invalid request: {error}"})
+                    continue
+                if 'cancel' in request:
+                    task = tasks.get(request_key(request['cancel']))
+                    if task is None:
+                        await send({'id': None, 'cancel': request['cancel'], 'ok': False,
+                                    'error': "no request in flight with this id"})
+                    else:
+                        task.cancel()
+                    continue
+                if request.get('command') == 'stats':
+                    await self.respond(request, send)
+                    continue
+                await backlog.acquire()
+                task = asyncio.create_task(run(request))
+                tasks[request_key(request.get('id'))] = task
+                task.add_done_callback(lambda task, request_id=request.get('id'): finished(task, request_id))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # ValueError: a line longer than the stream limit
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+            writer.close()
+
+    async def respond(self, request, send):
+        import asyncio
+        response = {'id': request.get('id')}
+        try:
+            response.update(await self.convert(request))
+        except asyncio.TimeoutError:
+            response.update(ok=False, error='timeout')
+        except Exception as error:  # e.g. BrokenProcessPool when a worker died
+            response.update(ok=False, error=f"{type(error).__name__}: {error}")
+        try:
+            await send(response)
+        except (ConnectionError, RuntimeError):
+            pass  # The client went away
+
+    async def convert(self, request):
+        import asyncio
+        command = request.get('command')
+        if command == 'stats':
+            return {'ok': True, 'stats': self.stats()}
+        if command not in COMMANDS:
+            return {'ok': False, 'error': f"Unknown command: {command}"}
+        if 'regex' in request:
+            text = f"alfabeto:{','.join(request.get('alphabet', ()))}\nexpressao:{request['regex']}\n"
+        else:
+            text = request.get('input')
+        if not isinstance(text, str):
+            return {'ok': False, 'error': "missing input"}
+        options = {name: value for name, value in (request.get('options') or {}).items()
+                   if name in SERVER_OPTIONS}
+        if options.get('engine') == 'parallel':
+            # The job already runs in a pool worker; the parallel engine would start a pool per job
+            return {'ok': False, 'error': "engine 'parallel' is not available in the server"}
+        if self.cache_dir:
+            options['cache_dir'] = self.cache_dir
+        limits = [limit for limit in (options.get('max_seconds'), request.get('timeout'), self.max_seconds)
+                  if limit is not None]
+        if limits:
+            options['max_seconds'] = min(limits)
+        key = hashlib.sha256(json.dumps([command, text, options], sort_keys=True).encode('utf-8')).digest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return dict(cached, cached=True)
+        if self.queued >= self.queue_limit:
+            self.rejected += 1
+            return {'ok': False, 'error': 'busy'}
+        self.misses += 1
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        loop = asyncio.get_running_loop()
+        self.running += 1
+
+        def release(future):
+            self.running -= 1
+            self.slots.release()
+
+        # The slot is given back when the worker is done, even if the request
+        # was cancelled or timed out meanwhile. A pool broken by an earlier
+        # request is replaced and the submission retried once.
+        executor = self.executor
+        try:
+            try:
+                future = executor.submit(convert_text, command, text, options)
+            except BrokenProcessPool:
+                self._replace_executor(executor)
+                executor = self.executor
+                future = executor.submit(convert_text, command, text, options)
+        except BaseException:
+            release(None)
+            raise
+        future.add_done_callback(lambda future: loop.is_closed() or loop.call_soon_threadsafe(release, future))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), request.get('timeout'))
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+            raise
+        result.pop('file', None)
+        if result['ok']:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return dict(result, cached=False)
+
+# Runs until interrupted or sent SIGTERM; either way the workers are
+# stopped before returning
+async def serve(server, host='127.0.0.1', port=8765, path=None):
+    import asyncio
+    listener = await server.start(host, port, path)
+    where = path or f"{host}:{port}"
+    print(f"Servidor de conversão em {where} ({server.workers} processos)", file=sys.stderr)
+    loop = asyncio.get_running_loop()
+    serving = asyncio.ensure_future(listener.serve_forever())
+    with contextlib.suppress(NotImplementedError):  # No signal handlers on Windows
+        loop.add_signal_handler(signal.SIGTERM, serving.cancel)
+    try:
+        async with listener:
+            await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        server.close()
+
+def run_server(args):
+    import asyncio
+    server = ConversionServer(args.workers, args.queue_limit, args.connection_limit, args.cache_size,
+                              args.cache_dir, max_seconds=args.max_seconds)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def run_convert(args):
+    try:
+        if args.to == 'binary':
+            text_to_binary(args.source, args.destination)
+        else:
+            binary_to_text(args.source, args.destination)
+    except AutomatonParseError as error:
+        print(f"Arquivo inválido:\n{error}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as error:
+        print(f"Erro: {error}", file=sys.stderr)
+        return 1
+    print(f"Arquivo {args.destination} gerado.", file=sys.stderr)
+    return 0
+
+def output_path(output_dir, filename, command, output_format='text'):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    extension = 'txt' if command == 'dfa2re' else {'text': 'txt'}.get(output_format, output_format)
+    return os.path.join(output_dir, f"{stem}.{command}.{extension}")
+
+# Outputs are named after the input's base name only, so inputs from
+# different directories can collide; the CLI refuses to run then instead of
+# overwriting. Returns {output path: [inputs]} for the colliding ones.
+def output_collisions(output_dir, files, command, output_format='text'):
+    sources = {}
+    for filename in files:
+        inputs = sources.setdefault(output_path(output_dir, filename, command, output_format), {})
+        inputs.setdefault(os.path.realpath(filename), filename)
+    return {path: list(inputs.values()) for path, inputs in sources.items() if len(inputs) > 1}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='conversor.py', description="Conversor AFD/AFN/ER")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    helps = {
+        'nfa2dfa': "converte AFN para AFD",
+        'dfa2re': "converte AFD para ER",
+        're2nfa': "converte ER para AFN",
+        'minimize': "converte AFN para AFD mínimo",
+        're2dfa': "converte ER para AFD",
+    }
+    for command in COMMANDS:
+        sub = subparsers.add_parser(command, help=helps[command])
+        sub.add_argument('inputs', nargs='+', help="arquivos, padrões glob ou diretórios")
+        sub.add_argument('-j', '--jobs', type=int, default=1, help="processos em paralelo")
+        sub.add_argument('-o', '--output-dir', help="diretório para os resultados")
+        sub.add_argument('--jsonl', help="grava os resultados em JSON Lines ('-' para a saída padrão)")
+        sub.add_argument('--cache-dir', help="diretório do cache de conversões")
+        if command != 'dfa2re':
+            sub.add_argument('--format', dest='output_format', choices=tuple(OUTPUT_FORMATS),
+                             default='text', help="formato do autômato de saída")
+            sub.add_argument('--sort', action='store_true',
+                             help="ordena estados e transições na saída")
+        sub.add_argument('--stats', action='store_true',
+                         help="mostra tempos por fase e contadores de cada conversão")
+        sub.add_argument('--profile', metavar='ARQUIVO',
+                         help="grava um perfil do cProfile (executa com --jobs 1)")
+        if command in ('nfa2dfa', 'minimize'):
+            sub.add_argument('--engine', choices=('sets', 'bitset', 'parallel'), default='sets')
+            sub.add_argument('--max-states', type=int, help="número máximo de estados do AFD")
+            sub.add_argument('--max-memory', type=int,
+                             help="memória máxima estimada da tabela de subconjuntos, em bytes")
+            sub.add_argument('--max-seconds', type=float, help="tempo máximo da determinização")
+            sub.add_argument('--on-limit', choices=('raise', 'partial'), default='raise',
+                             help="ao exceder um limite: falhar ou gravar o AFD parcial")
+        if command == 're2nfa':
+            sub.add_argument('--strategy', choices=('thompson', 'glushkov'), default='thompson')
+        if command == 're2dfa':
+            sub.add_argument('--method', choices=('derivatives', 'subset'), default='subset')
+            sub.add_argument('--max-states', type=int,
+                             help="número máximo de estados do AFD antes da minimização")
+            sub.add_argument('--max-seconds', type=float, help="tempo máximo da construção do AFD")
+        if command == 'dfa2re':
+            sub.add_argument('--max-size', type=int, default=RE_MAX_SIZE,
+                             help=f"tamanho máximo da ER resultante (padrão: {RE_MAX_SIZE})")
+            sub.add_argument('--max-seconds', type=float, help="tempo máximo da eliminação de estados")
+    sub = subparsers.add_parser('serve', help="servidor de conversões (JSON Lines por TCP ou socket Unix)")
+    sub.add_argument('--host', default='127.0.0.1')
+    sub.add_argument('--port', type=int, default=8765)
+    sub.add_argument('--socket', help="caminho de um socket Unix (em vez de TCP)")
+    sub.add_argument('--workers', type=int, help="processos de conversão")
+    sub.add_argument('--queue-limit', type=int, default=256, help="pedidos à espera antes de recusar")
+    sub.add_argument('--connection-limit', type=int, default=32,
+                     help="conversões simultâneas por conexão (o dobro pode ficar à espera)")
+    sub.add_argument('--cache-size', type=int, default=1024, help="resultados no cache em memória")
+    sub.add_argument('--max-seconds', type=float, default=60.0, help="tempo máximo de cada conversão")
+    sub.add_argument('--cache-dir', help="diretório do cache de conversões")
+    sub = subparsers.add_parser('convert', help="converte um autômato entre os formatos texto e binário")
+    sub.add_argument('source', help="arquivo de entrada")
+    sub.add_argument('destination', help="arquivo de saída")
+    sub.add_argument('--to', choices=('binary', 'text'), required=True, help="formato do arquivo de saída")
+    return parser
+
+def run_cli(argv):
+    args = build_parser().parse_args(argv)
+    if args.command == 'serve':
+        return run_server(args)
+    if args.command == 'convert':
+        return run_convert(args)
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("Nenhum arquivo de entrada encontrado.", file=sys.stderr)
+        return 1
+    if args.output_dir:
+        collisions = output_collisions(args.output_dir, files, args.command,
+                                       getattr(args, 'output_format', 'text'))
+        if collisions:
+            print(f"Arquivos de entrada diferentes com a mesma saída em {args.output_dir}:", file=sys.stderr)
+            for path, sources in collisions.items():
+                print(f"  {path}: {', '.join(sources)}", file=sys.stderr)
+            return 1
+        os.makedirs(args.output_dir, exist_ok=True)
+    jsonl = None
+    if args.jsonl:
+        jsonl = sys.stdout if args.jsonl == '-' else open(args.jsonl, 'w')
+    failures = 0
+    total = 0.0
+    start = time.perf_counter()
+    profiler = cProfile.Profile() if args.profile else None
+    jobs = 1 if profiler else args.jobs  # The profiler only sees this process
+    if profiler:
+        profiler.enable()
+    try:
+        names = ('engine', 'strategy', 'max_size', 'max_seconds', 'method', 'cache_dir', 'stats',
+                 'max_states', 'max_memory', 'on_limit', 'output_format', 'sort')
+        options = {name: getattr(args, name) for name in names if hasattr(args, name)}
+        for result in run_batch(args.command, files, jobs, options):
+            total += result['seconds']
+            if result['ok']:
+                status = 'ok'
+                if args.output_dir:
+                    with open(output_path(args.output_dir, result['file'], args.command,
+                                          getattr(args, 'output_format', 'text')), 'w') as f:
+                        f.write(result['output'] + '\n')
+                elif not jsonl:
+                    print(f"# {result['file']}")
+                    print(result['output'])
+            else:
+                failures += 1
+                status = result['error']
+            if jsonl:
+                jsonl.write(json.dumps(result, ensure_ascii=False) + '\n')
+            print(f"{result['file']}: {result['seconds']:.3f} s {status}", file=sys.stderr)
+            if 'metrics' in result:
+                print(format_metrics(result['metrics']), file=sys.stderr)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if jsonl and jsonl is not sys.stdout:
+            jsonl.close()
+    wall = time.perf_counter() - start
+    print(f"{len(files)} arquivo(s), {failures} falha(s), {total:.3f} s de conversão, {wall:.3f} s no total",
+          file=sys.stderr)
+    return 1 if failures else 0
+
+def ask_engine():
+    engine = input("Motor de conversão (conjuntos/bitset/parallel) [conjuntos]: ").strip()
+    engine = {'': 'sets', 'conjuntos': 'sets'}.get(engine, engine)
+    if engine not in ('sets', 'bitset', 'parallel'):
+        print("Motor inválido.")
+        sys.exit(1)
+    return engine
 
 def main():
     print("Bem-vindo ao conversor AFD/AFN/ER!")
@@ -177,31 +3552,74 @@ def main():
     print("1. Converter AFN para AFD")
     print("2. Converter AFD para ER")
     print("3. Converter ER para AFN")
-    option = input("Opção (1/2/3): ").strip()
-    if option == '1':
-        filename = input("Digite o nome do arquivo contendo o AFN: ").strip()
-        nfa = read_automaton(filename)
-        print("Convertendo AFN para AFD...")
-        dfa = nfa_to_dfa(nfa)
-        print("Resultado da conversão (AFD):")
-        print_automaton(dfa)
-    elif option == '2':
-        filename = input("Digite o nome do arquivo contendo o AFD: ").strip()
-        nfa = read_automaton(filename)
-        print("Convertendo AFD para ER...")
-        re = dfa_to_re(nfa)
-        print("Expressão Regular resultante:")
-        print(re)
-    elif option == '3':
-        filename = input("Digite o nome do arquivo contendo a ER: ").strip()
-        alphabet, expression = read_regular_expression(filename)
-        print("Convertendo ER para AFN...")
-        nfa = regex_to_nfa(expression, alphabet)
-        print("Resultado da conversão (AFN):")
-        print_automaton(nfa)
-    else:
-        print("Opção inválida.")
+    print("4. Converter AFN para AFD mínimo")
+    print("5. Converter autômato texto para binário")
+    print("6. Converter autômato binário para texto")
+    print("7. Converter ER para AFD (derivadas de Brzozowski)")
+    option = input("Opção (1/2/3/4/5/6/7): ").strip()
+    try:
+        if option == '1':
+            filename = input("Digite o nome do arquivo contendo o AFN: ").strip()
+            engine = ask_engine()
+            nfa = read_automaton(filename)
+            print("Convertendo AFN para AFD...")
+            dfa = nfa_to_dfa(nfa, engine)
+            print("Resultado da conversão (AFD):")
+            print_automaton(dfa)
+        elif option == '2':
+            filename = input("Digite o nome do arquivo contendo o AFD: ").strip()
+            nfa = read_automaton(filename)
+            print("Convertendo AFD para ER...")
+            stats = {}
+            re = dfa_to_re(nfa, RE_MAX_SIZE, stats)
+            print(f"{stats['eliminations']} estados eliminados, {stats['length']} caracteres, "
+                  f"{stats['seconds']:.3f} s")
+            print("Expressão Regular resultante:")
+            print(re)
+        elif option == '3':
+            filename = input("Digite o nome do arquivo contendo a ER: ").strip()
+            strategy = input("Construção (thompson/glushkov) [thompson]: ").strip() or 'thompson'
+            alphabet, expression = read_regular_expression(filename)
+            print("Convertendo ER para AFN...")
+            nfa = regex_to_nfa(expression, alphabet, strategy)
+            print("Resultado da conversão (AFN):")
+            print_automaton(nfa)
+        elif option == '4':
+            filename = input("Digite o nome do arquivo contendo o AFN: ").strip()
+            engine = ask_engine()
+            nfa = read_automaton(filename)
+            print("Convertendo AFN para AFD mínimo...")
+            stats = {}
+            dfa = nfa_to_minimal_dfa(nfa, engine, stats)
+            print(f"Estados do AFD: {stats['states_before']} -> {stats['states_after']} após minimização")
+            print("Resultado da conversão (AFD mínimo):")
+            print_automaton(dfa)
+        elif option == '7':
+            filename = input("Digite o nome do arquivo contendo a ER: ").strip()
+            alphabet, expression = read_regular_expression(filename)
+            print("Convertendo ER para AFD...")
+            dfa = regex_to_dfa(expression, alphabet)
+            print("Resultado da conversão (AFD):")
+            print_automaton(dfa)
+        elif option in ('5', '6'):
+            source = input("Digite o nome do arquivo de entrada: ").strip()
+            destination = input("Digite o nome do arquivo de saída: ").strip()
+            if option == '5':
+                text_to_binary(source, destination)
+            else:
+                binary_to_text(source, destination)
+            print(f"Arquivo {destination} gerado.")
+        else:
+            print("Opção inválida.")
+            sys.exit(1)
+    except AutomatonParseError as error:
+        print(f"Arquivo inválido:\n{error}")
+        sys.exit(1)
+    except ValueError as error:
+        print(f"Erro: {error}")
         sys.exit(1)
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     main()